@@ -0,0 +1,103 @@
+"""
+Load test for the sharded analytics counters.
+
+Drives update_analytics_counters at a fixed event rate against the
+Firestore emulator for each shard count, then checks that the summed
+shards account for every event that was accepted.
+
+The emulator does not enforce production's ~1 sustained write/second per
+document, so use the results to confirm correctness and compare latency
+trends across shard counts rather than as absolute production throughput.
+
+From the backend directory:
+    python -m benchmarks.analytics_counters_load --rate 200 --duration 10 --shards 1,10,20
+"""
+# Imported first: points FIRESTORE_EMULATOR_HOST at the emulator before any client exists
+from benchmarks.emulator import clear_emulator
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from database import get_db, initialize_firebase_app
+from utils import analytics, sharded_counters
+from utils.analytics_buffer import AnalyticsBuffer
+from utils.analytics_rollups import read_daily
+
+
+async def run_load(rate: int, duration: float, shards: int) -> dict:
+    await clear_emulator()
+    sharded_counters.ANALYTICS_COUNTER_SHARDS = shards
+    analytics.analytics_buffer = AnalyticsBuffer(get_db)
+    analytics.analytics_buffer.start()
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    latencies = []
+    errors = 0
+
+    async def one_event():
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await analytics.update_analytics_counters("api_call")
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            errors += 1
+
+    tasks = []
+    interval = 1 / rate
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < duration:
+        tasks.append(asyncio.create_task(one_event()))
+        sent += 1
+        next_send = started + sent * interval
+        await asyncio.sleep(max(0, next_send - time.perf_counter()))
+    await asyncio.gather(*tasks)
+    await analytics.analytics_buffer.stop()
+    elapsed = time.perf_counter() - started
+
+    metrics = analytics.analytics_buffer.get_metrics()
+    counted = (await read_daily(get_db(), today, today)).get(today, {}).get('apiCalls', 0)
+    latencies.sort()
+    return {
+        'shards': shards,
+        'sent': sent,
+        'errors': errors,
+        'achieved_per_sec': round((sent - errors) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2], 2) if latencies else None,
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2) if latencies else None,
+        'counted': counted,
+        'firestore_writes': metrics['writesIssued'],
+        'consistent': counted == sent - errors - metrics['eventsDropped']
+    }
+
+
+async def main(rate: int, duration: float, shard_counts: list):
+    initialize_firebase_app()
+    results = []
+    for shards in shard_counts:
+        print(f"[LOAD] {rate} events/s for {duration}s with {shards} shard(s)...")
+        results.append(await run_load(rate, duration, shards))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test sharded analytics counters")
+    parser.add_argument('--rate', type=int, default=200, help="target events per second")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per run")
+    parser.add_argument('--shards', default='1,10', help="comma separated shard counts to compare")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args.rate, args.duration, [int(s) for s in args.shards.split(',')]))
+    header = (f"{'shards':>7}{'sent':>8}{'errors':>8}{'ok/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'counted':>9}{'writes':>8}  consistent")
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['shards']:>7}{r['sent']:>8}{r['errors']:>8}{r['achieved_per_sec']:>9}{r['p50_ms']!s:>9}"
+              f"{r['p99_ms']!s:>9}{r['counted']:>9}{r['firestore_writes']:>8}  {r['consistent']}")
+    if not all(r['consistent'] for r in results):
+        raise SystemExit("❌ Counter totals do not match accepted events")
+    print("\n✅ All accepted events were counted")
@@ -0,0 +1,18 @@
+"""Firestore emulator helpers shared by the benchmarks"""
+import os
+
+# Must be set before any Firestore client is created
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
+
+import firebase_admin
+import httpx
+
+
+async def clear_emulator():
+    """Delete every document in the emulator's default database."""
+    host = os.environ['FIRESTORE_EMULATOR_HOST']
+    project_id = firebase_admin.get_app().project_id
+    url = f"http://{host}/emulator/v1/projects/{project_id}/databases/(default)/documents"
+    async with httpx.AsyncClient() as client:
+        resp = await client.delete(url)
+        resp.raise_for_status()
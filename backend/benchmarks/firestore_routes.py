@@ -0,0 +1,217 @@
+"""
+Firestore-emulator benchmarks for business, auth and analytics routes.
+
+Seeds the local Firestore emulator (the same one src/firebase/emulator.ts
+connects to) at several dataset sizes, then calls the route handlers
+directly and reports latency plus document reads/writes per call.
+
+Start the emulator first:
+    firebase emulators:start --only firestore
+
+Then, from the backend directory:
+    python -m benchmarks.firestore_routes
+    python -m benchmarks.firestore_routes --sizes 100,1000,10000 --iterations 20 --json results.json
+"""
+# Imported first: points FIRESTORE_EMULATOR_HOST at the emulator before any client exists
+from benchmarks.emulator import clear_emulator
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from firebase_admin import firestore
+from fastapi import Request
+
+from database import get_db, initialize_firebase_app
+from setup_database import setup_database
+from benchmarks.op_counter import OpCounter
+from routes import auth_routes, business_routes
+from routes.business_routes import SavedBusiness
+from utils import analytics
+from utils.business_keys import saved_business_id
+from utils.firestore_batches import commit_batches
+
+BENCH_USER = 'bench_user'
+# Stands in for the verified ID token the routes get from verify_token
+BENCH_TOKEN = {'uid': BENCH_USER}
+CATEGORIES = ['Plumber', 'Electrician', 'HVAC', 'Carpenter', 'Painter',
+              'Landscaper', 'House Cleaner', 'Locksmith', 'Pest Control', 'Roofer']
+AREAS = ['Andheri West, Mumbai', 'Koramangala, Bengaluru', 'Saket, New Delhi', 'Banjara Hills, Hyderabad']
+
+
+def _business_info(i: int) -> dict:
+    return {
+        "name": f"Bench Business {i}",
+        "rating": f"{random.uniform(3.5, 5.0):.1f}",
+        "reviews": random.randint(5, 500),
+        "phone": f"9{random.randint(100000000, 999999999)}",
+        "address": f"{i} Main Road, {random.choice(AREAS)}",
+        "website": f"www.bench{i}.example.com",
+        "category": random.choice(CATEGORIES),
+        "confidence": random.choice(["HIGH", "MEDIUM", "LOW"])
+    }
+
+
+def _request() -> Request:
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': [], 'query_string': b''})
+
+
+async def seed_old_logs(db, count: int):
+    old = datetime.now() - timedelta(days=120)
+    operations = [
+        lambda batch, i=i: batch.set(db.collection('activityLogs').document(), {
+            'type': 'search', 'message': f'old search {i}', 'userId': BENCH_USER,
+            'details': {'category': random.choice(CATEGORIES)},
+            'timestamp': old - timedelta(minutes=i)
+        })
+        for i in range(count)
+    ]
+    await commit_batches(db, operations)
+
+
+async def seed(db, size: int):
+    """setup_database.py fixtures plus `size` saved businesses, users and activity logs."""
+    await clear_emulator()
+    setup_database(firestore.client())
+
+    now = datetime.now()
+    operations = []
+    for i in range(size):
+        info = _business_info(i)
+        doc_id = saved_business_id(BENCH_USER, info['name'], info['address'])
+        operations.append(lambda batch, i=i, doc_id=doc_id, info=info: batch.set(
+            db.collection('savedBusinesses').document(doc_id), {
+                'userId': BENCH_USER, 'businessInfo': info, 'docId': doc_id, 'isSaved': True,
+                'savedAt': now - timedelta(minutes=i)
+            }))
+    for i in range(max(size // 10, 1)):
+        operations.append(lambda batch, i=i: batch.set(
+            db.collection('users').document(f'bench_user_{i}'), {
+                'userId': f'bench_user_{i}', 'name': f'Bench User {i}', 'email': f'bench{i}@example.com',
+                'provider': 'google', 'lastLoginAt': now
+            }))
+    for i in range(size):
+        operations.append(lambda batch, i=i: batch.set(db.collection('activityLogs').document(), {
+            'type': 'search', 'message': f'search {i}', 'userId': BENCH_USER,
+            'details': {'category': random.choice(CATEGORIES)},
+            'timestamp': now - timedelta(minutes=i)
+        }))
+    await commit_batches(db, operations)
+    await seed_old_logs(db, size // 2)
+
+
+async def measure(counter: OpCounter, name: str, iterations: int, call, before=None) -> dict:
+    latencies, reads, writes = [], [], []
+    for i in range(iterations):
+        if before:
+            await before(i)
+        counter.reset()
+        start = time.perf_counter()
+        await call(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        reads.append(counter.reads)
+        writes.append(counter.writes)
+    latencies.sort()
+    return {
+        'operation': name,
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'reads_per_call': round(statistics.mean(reads), 1),
+        'writes_per_call': round(statistics.mean(writes), 1)
+    }
+
+
+async def run_size(db, counter: OpCounter, size: int, iterations: int, batch_size: int) -> list:
+    print(f"\n[BENCH] Seeding dataset size {size}...")
+    await seed(db, size)
+    results = []
+
+    async def save(i):
+        info = _business_info(size + i)
+        await business_routes.save_business(SavedBusiness(userId=BENCH_USER, businessInfo=info), token=BENCH_TOKEN)
+    results.append(await measure(counter, 'save', iterations, save))
+
+    async def batch_save(i):
+        start = size + iterations + i * batch_size
+        await business_routes.batch_save_businesses([
+            SavedBusiness(userId=BENCH_USER, businessInfo=_business_info(start + j)) for j in range(batch_size)
+        ], token=BENCH_TOKEN)
+    results.append(await measure(counter, f'batch-save x{batch_size}', iterations, batch_save))
+
+    async def clear_cache(i):
+        business_routes.saved_businesses_cache.clear()
+
+    async def list_saved(i):
+        await business_routes.get_saved_businesses(_request(), BENCH_USER, limit=50, start_after=None, fields=None,
+                                                   token=BENCH_TOKEN)
+    results.append(await measure(counter, 'list', iterations, list_saved, before=clear_cache))
+    results.append(await measure(counter, 'list (cached)', iterations, list_saved))
+
+    async def by_category(i):
+        await business_routes.get_businesses_by_category(_request(), BENCH_USER, random.choice(CATEGORIES),
+                                                         limit=50, start_after=None, fields=None, token=BENCH_TOKEN)
+    results.append(await measure(counter, 'by-category', iterations, by_category, before=clear_cache))
+
+    async def user_profile(i):
+        await auth_routes.get_user_profile(_request(), f'bench_user_{i % max(size // 10, 1)}')
+    results.append(await measure(counter, 'auth user profile', iterations, user_profile))
+
+    async def clear_report_cache(i):
+        analytics.report_cache.clear()
+        analytics.count_cache.clear()
+
+    async def report(i):
+        await analytics.get_analytics_report(7)
+    results.append(await measure(counter, 'analytics report', iterations, report, before=clear_report_cache))
+    results.append(await measure(counter, 'analytics report (cached)', iterations, report))
+
+    async def reseed_old_logs(i):
+        await seed_old_logs(db, max(size // 20, 1))
+
+    async def cleanup(i):
+        await analytics.cleanup_old_logs(90)
+    results.append(await measure(counter, 'cleanup', iterations, cleanup, before=reseed_old_logs))
+
+    for row in results:
+        row['size'] = size
+    return results
+
+
+def print_table(rows: list):
+    header = f"{'size':>7}  {'operation':<22}{'p50 ms':>10}{'p95 ms':>10}{'reads':>10}{'writes':>10}"
+    print("\n" + header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['size']:>7}  {row['operation']:<22}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['reads_per_call']:>10}{row['writes_per_call']:>10}")
+
+
+async def main(sizes: list, iterations: int, batch_size: int) -> list:
+    random.seed(42)
+    initialize_firebase_app()
+    db = get_db()
+    counter = OpCounter().install(db)
+    rows = []
+    for size in sizes:
+        rows.extend(await run_size(db, counter, size, iterations, batch_size))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Firestore-backed routes against the emulator")
+    parser.add_argument('--sizes', default='100,1000,5000', help="comma separated saved-business counts")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--json', dest='json_path', help="also write results to this file")
+    args = parser.parse_args()
+
+    rows = asyncio.run(main([int(s) for s in args.sizes.split(',')], args.iterations, args.batch_size))
+    print_table(rows)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n✅ Results written to {args.json_path}")
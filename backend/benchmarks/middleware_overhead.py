@@ -0,0 +1,144 @@
+"""
+Per-request overhead of the HTTP middleware stack.
+
+Builds the same small FastAPI app with different middleware stacks and
+drives it in-process through the ASGI interface (no sockets), so the
+numbers isolate middleware cost from networking and Firestore:
+
+    none              no middleware
+    base_http         the previous BaseHTTPMiddleware security headers
+    asgi_security     SecurityHeadersMiddleware (plain ASGI)
+    asgi_full         security headers + CompressionMiddleware
+
+Each stack is measured on a small JSON response (below the compression
+threshold), a large JSON response and a streamed NDJSON response.
+
+From the backend directory:
+    python -m benchmarks.middleware_overhead --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.compression import CompressionMiddleware
+from middleware.security import SecurityHeadersMiddleware
+
+SMALL_BODY = json.dumps({'status': 'ok'}).encode()
+LARGE_BODY = json.dumps([{'name': f'Provider {i}', 'phone': '555-0100', 'address': f'{i} Main St',
+                          'rating': '4.5', 'reviews': i, 'sources': ['google', 'yelp']}
+                         for i in range(200)]).encode()
+STREAM_ROWS = [json.dumps({'id': i, 'type': 'search', 'message': 'plumber near me'}).encode() + b'\n'
+               for i in range(100)]
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation this benchmark compares against."""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["Cross-Origin-Opener-Policy"] = "unsafe-none"
+        response.headers["Cross-Origin-Embedder-Policy"] = "unsafe-none"
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        return response
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/small")
+    async def small():
+        return Response(SMALL_BODY, media_type='application/json')
+
+    @app.get("/large")
+    async def large():
+        return Response(LARGE_BODY, media_type='application/json')
+
+    @app.get("/stream")
+    async def stream():
+        async def rows():
+            for row in STREAM_ROWS:
+                yield row
+        return StreamingResponse(rows(), media_type='application/x-ndjson')
+
+    if stack == 'base_http':
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+    elif stack in ('asgi_security', 'asgi_full'):
+        app.add_middleware(SecurityHeadersMiddleware)
+    if stack == 'asgi_full':
+        app.add_middleware(CompressionMiddleware)
+    return app
+
+
+async def call(app, path: str) -> int:
+    """One GET through the ASGI app; returns the number of body bytes sent."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+        'headers': [(b'host', b'bench'), (b'accept-encoding', b'gzip, br')],
+        'client': ('127.0.0.1', 1234), 'server': ('bench', 80),
+    }
+    sent = 0
+    requested = False
+
+    async def receive():
+        # Like a real server: the request body once, then nothing until the client goes away
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal sent
+        if message['type'] == 'http.response.body':
+            sent += len(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return sent
+
+
+async def measure(app, path: str, requests: int) -> dict:
+    for _ in range(min(200, requests)):
+        await call(app, path)
+    timings = []
+    sent = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        sent = await call(app, path)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        'p50_us': round(statistics.median(timings), 1),
+        'p95_us': round(timings[int(len(timings) * 0.95) - 1], 1),
+        'bytes': sent,
+    }
+
+
+async def main(requests: int) -> list:
+    results = []
+    for stack in ('none', 'base_http', 'asgi_security', 'asgi_full'):
+        app = build_app(stack)
+        for path in ('/small', '/large', '/stream'):
+            results.append({'stack': stack, 'path': path, **await measure(app, path, requests)})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-request middleware overhead")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per stack and path")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args.requests))
+    baseline = {r['path']: r['p50_us'] for r in results if r['stack'] == 'none'}
+    header = f"{'stack':<15}{'path':<9}{'p50 us':>9}{'p95 us':>9}{'+p50 us':>9}{'bytes':>8}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        overhead = round(r['p50_us'] - baseline[r['path']], 1)
+        print(f"{r['stack']:<15}{r['path']:<9}{r['p50_us']:>9}{r['p95_us']:>9}{overhead:>9}{r['bytes']:>8}")
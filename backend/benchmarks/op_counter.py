@@ -0,0 +1,98 @@
+"""Count Firestore document reads and writes made through the async client
+
+Wraps the RPC methods of the client's underlying GAPIC API object. This
+relies on the private _firestore_api attribute, which is fine for a
+benchmark harness but must never be used by application code.
+"""
+
+
+class _CountingStream:
+    """Async iterator proxy that counts documents in streamed RPC responses."""
+
+    def __init__(self, stream, on_response):
+        self._stream = stream
+        self._on_response = on_response
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        response = await self._stream.__anext__()
+        self._on_response(response)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _request_of(args, kwargs):
+    return kwargs.get('request') if 'request' in kwargs else (args[0] if args else None)
+
+
+def _field(request, name):
+    if isinstance(request, dict):
+        return request.get(name) or []
+    return getattr(request, name, None) or []
+
+
+class OpCounter:
+    """Tallies billed document reads and writes for a firestore AsyncClient."""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+
+    def reset(self):
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+
+    def snapshot(self) -> dict:
+        return {'reads': self.reads, 'writes': self.writes, 'rpcs': self.rpcs}
+
+    def _count_document(self, response):
+        if 'document' in response:
+            self.reads += 1
+
+    def _count_found(self, response):
+        if 'found' in response:
+            self.reads += 1
+
+    def _count_aggregation(self, response):
+        # Count queries bill one read per batch of up to 1000 index entries; one batch per response here
+        if 'result' in response:
+            self.reads += 1
+
+    def install(self, db):
+        api = db._firestore_api
+        counter = self
+
+        def wrap_unary(name, count_writes=False, count_read=False):
+            original = getattr(api, name)
+
+            async def wrapper(*args, **kwargs):
+                counter.rpcs += 1
+                if count_writes:
+                    counter.writes += len(_field(_request_of(args, kwargs), 'writes'))
+                response = await original(*args, **kwargs)
+                if count_read and 'name' in response:
+                    counter.reads += 1
+                return response
+            setattr(api, name, wrapper)
+
+        def wrap_stream(name, on_response):
+            original = getattr(api, name)
+
+            async def wrapper(*args, **kwargs):
+                counter.rpcs += 1
+                stream = await original(*args, **kwargs)
+                return _CountingStream(stream, on_response)
+            setattr(api, name, wrapper)
+
+        wrap_unary('commit', count_writes=True)
+        wrap_unary('get_document', count_read=True)
+        wrap_stream('run_query', self._count_document)
+        wrap_stream('batch_get_documents', self._count_found)
+        wrap_stream('run_aggregation_query', self._count_aggregation)
+        return self
@@ -0,0 +1,23 @@
+"""
+Compact analytics counters into time-bucketed rollups.
+
+Folds settled days' shards into one rollup document per day, folds days
+older than ANALYTICS_DAILY_RETENTION_DAYS into week and month rollups and
+prunes expired hour buckets. Safe to run on a schedule (e.g. daily).
+
+Usage:
+    python compact_analytics.py                   # compact
+    python compact_analytics.py --migrate-legacy  # also import the old analytics/daily document
+"""
+import asyncio
+import sys
+from database import get_db
+from utils.analytics_rollups import compact_analytics
+
+if __name__ == "__main__":
+    try:
+        result = asyncio.run(compact_analytics(get_db(), migrate_legacy='--migrate-legacy' in sys.argv[1:]))
+        print(f"✅ Compaction finished: {result}")
+    except Exception as e:
+        print(f"❌ Compaction failed: {str(e)}")
+        raise
@@ -0,0 +1,59 @@
+"""Shared async Firestore access layer
+
+Routes must not call the synchronous Firestore client from async handlers,
+since every round trip would block the event loop. This module owns the one
+AsyncClient per process and a few helpers for concurrent reads.
+"""
+import os
+from typing import Dict, Iterable, List
+import firebase_admin
+from firebase_admin import credentials, firestore_async
+
+_db = None
+
+
+def initialize_firebase_app():
+    """Initialize the Firebase Admin app once per process and return it."""
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        pass
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    service_account_path = os.path.join(current_dir, "firebase-service-account.json")
+    if not os.path.exists(service_account_path):
+        raise FileNotFoundError(f"Service account file not found at: {service_account_path}")
+
+    cred = credentials.Certificate(service_account_path)
+    return firebase_admin.initialize_app(cred)
+
+
+def get_db():
+    """Process-wide async Firestore client (its gRPC channel pools connections)."""
+    global _db
+    if _db is None:
+        initialize_firebase_app()
+        _db = firestore_async.client()
+    return _db
+
+
+async def get_documents(refs: Iterable) -> Dict[str, object]:
+    """Fetch many documents in one batched read, keyed by document path.
+
+    Missing documents are included with exists == False.
+    """
+    refs = list({ref.path: ref for ref in refs}.values())
+    if not refs:
+        return {}
+    return {doc.reference.path: doc async for doc in get_db().get_all(refs)}
+
+
+async def stream_to_list(query) -> List[object]:
+    """Collect an async query stream into a list."""
+    return [doc async for doc in query.stream()]
+
+
+async def count_query(query) -> int:
+    """Server-side COUNT aggregation; bills one read per 1000 matches instead of one per document."""
+    results = await query.count(alias='total').get()
+    return int(results[0][0].value) if results and results[0] else 0
@@ -1,23 +1,17 @@
 """Firebase initialization and utilities"""
-import os
-from firebase_admin import credentials, initialize_app, auth, firestore
-from pathlib import Path
+from typing import Iterable, List, Optional
+from firebase_admin import firestore
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from database import get_db, initialize_firebase_app
+from utils.token_cache import token_cache
 
 # Initialize Firebase Admin
 def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
+    """Initialize Firebase Admin SDK and return the shared async Firestore client"""
     try:
-        # Get the absolute path to the service account file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        service_account_path = os.path.join(current_dir, "firebase-service-account.json")
-        
-        if not os.path.exists(service_account_path):
-            raise FileNotFoundError(f"Service account file not found at: {service_account_path}")
-            
-        # Initialize Firebase Admin
-        cred = credentials.Certificate(service_account_path)
-        app = initialize_app(cred)
-        return firestore.client()
+        initialize_firebase_app()
+        return get_db()
     except Exception as e:
         print(f"Failed to initialize Firebase: {e}")
         raise
@@ -25,10 +19,10 @@ def initialize_firebase():
 # Initialize on module import
 db = initialize_firebase()
 
-def verify_firebase_token(id_token: str):
-    """Verify Firebase ID token"""
+async def verify_firebase_token(id_token: str):
+    """Verify Firebase ID token, reusing cached claims for tokens already verified"""
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = await token_cache.verify(id_token)
         return decoded_token
     except Exception as e:
         raise Exception(f"Invalid token: {str(e)}")
@@ -38,7 +32,7 @@ async def get_user_profile(uid: str):
     """Get user profile from Firestore"""
     try:
         doc_ref = db.collection('users').document(uid)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         if doc.exists:
             return doc.to_dict()
         return None
@@ -46,12 +40,73 @@ async def get_user_profile(uid: str):
         print(f"Error getting user profile: {e}")
         return None
 
-async def update_user_profile(uid: str, data: dict):
-    """Update user profile in Firestore"""
+class ProfileNotFoundError(Exception):
+    """The profile to update does not exist"""
+
+class ProfileConflictError(Exception):
+    """The profile changed since the update time the caller expected"""
+
+class InvalidFieldPathError(ValueError):
+    """A profile update names a field profiles do not have, or has nothing to write"""
+
+_MISSING = object()
+
+def _masked_updates(data: dict, field_mask: List[str], allowed_fields: Optional[Iterable[str]] = None) -> dict:
+    """Field-path updates for the paths in field_mask
+
+    A path set to null in data is deleted; a path absent from data is left
+    untouched. With allowed_fields, a path whose top-level field is not
+    one of them raises InvalidFieldPathError.
+    """
+    allowed = set(allowed_fields) if allowed_fields is not None else None
+    updates = {}
+    for path in field_mask:
+        if allowed is not None and path.split('.', 1)[0] not in allowed:
+            raise InvalidFieldPathError(f"Unknown profile field: {path}")
+        value = data
+        for part in path.split('.'):
+            value = value.get(part, _MISSING) if isinstance(value, dict) else _MISSING
+        if value is None:
+            updates[path] = firestore.DELETE_FIELD
+        elif value is not _MISSING:
+            updates[path] = value
+    return updates
+
+async def update_user_profile(uid: str, data: dict, field_mask: Optional[List[str]] = None,
+                              expected_update_time: Optional[str] = None,
+                              allowed_fields: Optional[Iterable[str]] = None) -> dict:
+    """Update an existing user profile in a single round trip
+
+    The write itself fails if the profile does not exist, so no read is
+    needed first. Without field_mask the top-level fields of data are
+    replaced; with it only the listed field paths (e.g.
+    'notifications.marketing') that data sets are written, and those it
+    sets to null are deleted. allowed_fields restricts the top-level fields
+    a mask may name. expected_update_time (the RFC 3339 updateTime of the
+    version the caller read) makes the update conditional on nobody having
+    written the profile since.
+    """
+    doc_ref = db.collection('users').document(uid)
+    updates = data
+    if field_mask:
+        updates = _masked_updates(data, field_mask, allowed_fields)
+        if not updates:
+            raise InvalidFieldPathError("None of the listed fields are set in the update")
+    if not updates:
+        # Firestore rejects an empty update with a bare ValueError
+        raise InvalidFieldPathError("No profile fields to update")
+    option = None
+    if expected_update_time:
+        try:
+            last_update_time = DatetimeWithNanoseconds.from_rfc3339(expected_update_time)
+        except ValueError:
+            # Not a version any profile can have, so the precondition can never hold
+            raise ProfileConflictError(f"{expected_update_time!r} is not a profile updateTime")
+        option = db.write_option(last_update_time=last_update_time)
     try:
-        doc_ref = db.collection('users').document(uid)
-        doc_ref.update(data)
-        return True
-    except Exception as e:
-        print(f"Error updating user profile: {e}")
-        return False
+        result = await doc_ref.update(updates, option=option)
+    except NotFound:
+        raise ProfileNotFoundError(f"User profile {uid} not found")
+    except FailedPrecondition:
+        raise ProfileConflictError(f"User profile {uid} was modified after {expected_update_time}")
+    return {'status': 'success', 'updateTime': result.update_time.rfc3339()}
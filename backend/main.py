@@ -4,11 +4,19 @@ from pydantic import BaseModel
 import json
 import os
 import re
-import requests
 import traceback
 from dotenv import load_dotenv
 from routes.auth_routes import router as auth_router
+from routes.business_routes import router as business_router
+from routes.firebase_routes import router as firebase_router
+from routes.enhanced_routes import router as enhanced_router
 from config import client
+from services.gemini_client import gemini_client
+from utils.dedup import ProviderDeduplicator
+from utils.analytics import analytics_buffer
+from utils.activity_queue import activity_log_queue
+from utils.token_cache import token_cache
+from services.categories_store import categories_store
 
 # Load environment variables
 load_dotenv(override=True)
@@ -29,8 +37,20 @@ app.add_middleware(
 from middleware.security import SecurityHeadersMiddleware
 app.add_middleware(SecurityHeadersMiddleware)
 
-# Mount auth routes
+# Compress JSON and streamed exports; added last so it wraps everything else
+from middleware.compression import CompressionMiddleware
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv('COMPRESSION_MIN_SIZE', 1024)),
+    gzip_level=int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),
+    brotli_quality=int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+)
+
+# Mount API routes; the Firebase routes reuse business paths, so they live under their own prefix
 app.include_router(auth_router, prefix="/api")
+app.include_router(business_router, prefix="/api")
+app.include_router(firebase_router, prefix="/api/firebase")
+app.include_router(enhanced_router)  # carries its own /api/v1 prefix
 
 # Model Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '').strip()
@@ -40,6 +60,24 @@ GEMINI_ENDPOINT = os.getenv('GEMINI_ENDPOINT', '').strip()
 if not GEMINI_ENDPOINT and GEMINI_MODEL:
     GEMINI_ENDPOINT = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
 
+@app.on_event("startup")
+async def start_background_services():
+    """Open the pooled Gemini HTTP client and start background workers with the app."""
+    gemini_client.start()
+    analytics_buffer.start()
+    activity_log_queue.start()
+    token_cache.start()
+    await categories_store.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    """Flush buffered analytics and queued activity logs, and release kept-alive Gemini connections on shutdown."""
+    await analytics_buffer.stop()
+    await activity_log_queue.stop()
+    await token_cache.stop()
+    await categories_store.stop()
+    gemini_client.close()
+
 # Print configuration
 print(f"[CONFIG] OpenAI API KEY present: {bool(client.api_key)}")
 print(f"[CONFIG] Gemini Fallback Configuration:")
@@ -222,7 +260,7 @@ def _invoke_model(model_name: str, input_text: str, use_search_tools: bool = Fal
         }
 
         print("[GEMINI] Sending request to Gemini API...")
-        resp = requests.post(GEMINI_ENDPOINT, headers=headers, json=payload, timeout=60)
+        resp = gemini_client.post(GEMINI_ENDPOINT, headers=headers, json=payload)
         print(f"[GEMINI] Response status code: {resp.status_code}")
         resp_json = resp.json()
 
@@ -367,7 +405,7 @@ No extra commentary, only JSON.'''
 
             # ENHANCED: Process providers with better phone handling and logging
             providers = []
-            seen = set(name.lower().strip() for name in (request.existing or []))
+            deduper = ProviderDeduplicator(request.existing)
             
             print(f"[PROCESSING] Raw data from model: {json.dumps(data, indent=2)}")
             
@@ -378,13 +416,11 @@ No extra commentary, only JSON.'''
                 try:
                     normalized = _normalize_provider(provider)
                     if normalized:
-                        name = normalized['name'].lower()
-                        if name not in seen:
+                        if deduper.add(normalized):
                             providers.append(normalized)
-                            seen.add(name)
                             print(f"[PROVIDER {i}] Added with phone: '{normalized['phone']}'")
                         else:
-                            print(f"[PROVIDER {i}] Skipped - duplicate name: '{name}'")
+                            print(f"[PROVIDER {i}] Skipped - near-duplicate of an existing provider: '{normalized['name']}'")
                     else:
                         print(f"[PROVIDER {i}] Skipped - normalization failed")
                 except Exception as e:
@@ -540,6 +576,7 @@ async def nlp_endpoint(request: NlpRequest):
 
             # ENHANCED: Process providers with phone validation
             providers = []
+            deduper = ProviderDeduplicator()
             raw_providers = data.get('providers', [])
             
             print(f"[NLP] Processing {len(raw_providers)} raw providers...")
@@ -547,7 +584,9 @@ async def nlp_endpoint(request: NlpRequest):
             for i, provider in enumerate(raw_providers):
                 print(f"[NLP PROVIDER {i}] Raw: {provider}")
                 normalized = _normalize_provider(provider)
-                if normalized:
+                if normalized and not deduper.add(normalized):
+                    print(f"[NLP PROVIDER {i}] Skipped - near-duplicate: '{normalized['name']}'")
+                elif normalized:
                     providers.append(normalized)
                     print(f"[NLP PROVIDER {i}] Normalized phone: {normalized['phone']}")
                 else:
@@ -607,7 +646,12 @@ async def health_check():
             "models": {
                 "openai": "available" if openai_available else "unavailable",
                 "gemini": "available" if gemini_available else "unavailable"
-            }
+            },
+            "gemini_http": gemini_client.get_metrics(),
+            "analytics_buffer": analytics_buffer.get_metrics(),
+            "activity_queue": activity_log_queue.get_metrics(),
+            "token_cache": token_cache.get_metrics(),
+            "categories_store": categories_store.get_metrics()
         }
     except Exception as e:
         return {
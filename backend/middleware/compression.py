@@ -0,0 +1,156 @@
+"""Response compression as plain ASGI middleware
+
+Negotiates brotli (when the optional `brotli` package is installed) or gzip
+from Accept-Encoding. Bodies under minimum_size, already-encoded responses,
+304/204s and content types that do not compress (images, archives) pass
+through untouched. Streaming responses are compressed message by message and
+flushed after each one, so clients still receive rows as they are produced.
+Compressed responses carry a weak version of any strong ETag, since the
+encoded bytes are not the ones it was computed for.
+"""
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types that are already compressed
+INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'application/gzip', 'application/zip',
+                        'application/x-gzip', 'application/octet-stream', 'font/woff')
+
+
+class _GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _accepted_encodings(header: str) -> set:
+    """Codings named in Accept-Encoding, minus any refused with q=0."""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0 and name.strip():
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _encoder(self, scope):
+        accepted = _accepted_encodings(Headers(scope=scope).get('accept-encoding', ''))
+        if brotli is not None and 'br' in accepted:
+            return lambda: _BrotliEncoder(self.brotli_quality)
+        if 'gzip' in accepted or '*' in accepted:
+            return lambda: _GzipEncoder(self.gzip_level)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('method') == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        make_encoder = self._encoder(scope)
+        if make_encoder is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message.get('headers', []))
+                content_type = headers.get('content-type', '')
+                passthrough = (
+                    message['status'] in (204, 304)
+                    or 'content-encoding' in headers
+                    or content_type.startswith(INCOMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether compressing pays off
+                    start_message = message
+                return
+
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if start_message is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start_message)
+                    start_message = None
+                    passthrough = True
+                    await send(message)
+                    return
+                encoder = make_encoder()
+                headers = MutableHeaders(scope=start_message)
+                headers['Content-Encoding'] = encoder.name
+                headers.add_vary_header('Accept-Encoding')
+                # The encoded bytes differ from the identity body the strong ETag was computed for
+                etag = headers.get('etag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = 'W/' + etag
+                if 'content-length' in headers:
+                    del headers['content-length']
+                if not more_body:
+                    body = encoder.compress(body) + encoder.finish()
+                    headers['Content-Length'] = str(len(body))
+                    await send(start_message)
+                    start_message = None
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+                await send(start_message)
+                start_message = None
+
+            if more_body:
+                await send({'type': 'http.response.body', 'body': encoder.compress(body) + encoder.flush(),
+                            'more_body': True})
+            else:
+                await send({'type': 'http.response.body', 'body': encoder.compress(body) + encoder.finish()})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,11 +1,32 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi.responses import Response
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["Cross-Origin-Opener-Policy"] = "unsafe-none"
-        response.headers["Cross-Origin-Embedder-Policy"] = "unsafe-none"
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        return response
+"""Security headers as plain ASGI middleware
+
+Only the http.response.start message is touched, so streaming bodies pass
+through unchanged and no per-request task or body wrapper is created.
+"""
+from starlette.datastructures import MutableHeaders
+
+SECURITY_HEADERS = {
+    "Cross-Origin-Opener-Policy": "unsafe-none",
+    "Cross-Origin-Embedder-Policy": "unsafe-none",
+    "Access-Control-Allow-Credentials": "true",
+}
+
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app, headers: dict = None):
+        self.app = app
+        self.headers = list((headers or SECURITY_HEADERS).items())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in self.headers:
+                    headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,84 @@
+"""
+Backfill deterministic document ids for savedBusinesses.
+
+Older saved businesses were stored under random auto-generated ids. This
+moves each one to saved_business_id(userId, name, address) so existence
+checks can be done with a single document get. Duplicates that collapse to
+the same id are removed, keeping whichever copy was migrated first.
+
+Usage:
+    python migrate_saved_business_ids.py            # dry run
+    python migrate_saved_business_ids.py --apply    # write changes
+"""
+import argparse
+from setup_database import initialize_firebase
+from utils.business_keys import saved_business_id
+
+# Firestore rejects batches over 500 operations; each move is a set + delete
+MAX_BATCH_OPERATIONS = 500
+
+
+def migrate_saved_business_ids(db_client, apply: bool = False):
+    collection = db_client.collection('savedBusinesses')
+    batch = db_client.batch()
+    pending_ops = 0
+    claimed = set()
+    stats = {'scanned': 0, 'alreadyMigrated': 0, 'moved': 0, 'duplicatesRemoved': 0, 'skipped': 0}
+
+    def flush():
+        nonlocal batch, pending_ops
+        if pending_ops and apply:
+            batch.commit()
+        batch = db_client.batch()
+        pending_ops = 0
+
+    for doc in collection.stream():
+        stats['scanned'] += 1
+        data = doc.to_dict() or {}
+        info = data.get('businessInfo') or {}
+        user_id = data.get('userId')
+
+        if not user_id or not info.get('name'):
+            print(f"⚠️ Skipping {doc.id}: missing userId or business name")
+            stats['skipped'] += 1
+            continue
+
+        target_id = saved_business_id(user_id, info.get('name'), info.get('address'))
+        if doc.id == target_id:
+            stats['alreadyMigrated'] += 1
+            claimed.add(target_id)
+            continue
+
+        if pending_ops + 2 > MAX_BATCH_OPERATIONS:
+            flush()
+
+        if target_id in claimed or collection.document(target_id).get().exists:
+            batch.delete(doc.reference)
+            pending_ops += 1
+            stats['duplicatesRemoved'] += 1
+            print(f"🗑️ Duplicate {doc.id} -> {target_id} ({info.get('name')})")
+        else:
+            batch.set(collection.document(target_id), {**data, 'docId': target_id})
+            batch.delete(doc.reference)
+            pending_ops += 2
+            stats['moved'] += 1
+            print(f"➡️ Moving {doc.id} -> {target_id} ({info.get('name')})")
+        claimed.add(target_id)
+
+    flush()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill deterministic savedBusinesses document ids")
+    parser.add_argument('--apply', action='store_true', help="write changes (default is a dry run)")
+    args = parser.parse_args()
+
+    try:
+        db = initialize_firebase()
+        stats = migrate_saved_business_ids(db, apply=args.apply)
+        mode = "applied" if args.apply else "dry run, nothing written"
+        print(f"✅ Migration finished ({mode}): {stats}")
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        raise
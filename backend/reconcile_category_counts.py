@@ -0,0 +1,27 @@
+"""
+Rebuild per-user saved-business category counters.
+
+The counters in savedBusinessCounts are maintained incrementally; this job
+recounts savedBusinesses and repairs any summary that has drifted. Safe to
+run on a schedule.
+
+Usage:
+    python reconcile_category_counts.py              # all users
+    python reconcile_category_counts.py <user_id>    # one user
+"""
+import asyncio
+import sys
+from database import get_db
+from utils.category_counters import reconcile_all_counts, reconcile_user_counts
+
+if __name__ == "__main__":
+    try:
+        db = get_db()
+        if len(sys.argv) > 1:
+            result = asyncio.run(reconcile_user_counts(db, sys.argv[1]))
+        else:
+            result = asyncio.run(reconcile_all_counts(db))
+        print(f"✅ Reconciliation finished: {result}")
+    except Exception as e:
+        print(f"❌ Reconciliation failed: {str(e)}")
+        raise
@@ -1,12 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
+import asyncio
 import datetime
+import os
 from firebase_admin import auth
-from firebase_init import db, verify_firebase_token
+from firebase_init import (db, verify_firebase_token, update_user_profile as update_profile,
+                           InvalidFieldPathError, ProfileConflictError, ProfileNotFoundError)
+from routes.firebase_routes import require_admin
+from utils.cache import LRUCache
+from utils.http_cache import encode_json, etag_matches, if_match_version, not_modified, version_etag
+from utils.pagination import parse_fields
+from utils.token_cache import token_cache
 
 router = APIRouter()
 
+# Profile fields a login can change; anything else is left alone
+PROFILE_FIELDS = ('userId', 'name', 'email', 'photoURL', 'provider')
+# A login with no profile changes still refreshes lastLoginAt once this many seconds have passed
+LOGIN_REFRESH_INTERVAL = float(os.getenv('LOGIN_REFRESH_INTERVAL', 3600))
+# Profiles as last written per uid, so unchanged logins need neither a read nor a write
+known_profiles = LRUCache(max_entries=int(os.getenv('LOGIN_PROFILE_CACHE_MAX_ENTRIES', 10000)),
+                          ttl_seconds=LOGIN_REFRESH_INTERVAL)
+# Profiles are per-user and edited in place: always revalidate, never share
+PROFILE_CACHE_CONTROL = 'private, no-cache'
+login_metrics = {'logins': 0, 'writes': 0, 'writesSkipped': 0, 'getUserCalls': 0}
+
 class AuthRequest(BaseModel):
     token: str  # ID token from Google/Facebook
     provider: str  # "google" or "facebook"
@@ -19,89 +39,176 @@ class UserProfile(BaseModel):
     provider: str
     lastLoginAt: Optional[datetime.datetime] = None
 
+class UserProfileUpdate(BaseModel):
+    """Profile fields a PUT may set; with ?fields= only the listed ones need to be sent"""
+    userId: Optional[str] = None
+    name: Optional[str] = None
+    email: Optional[str] = None
+    photoURL: Optional[str] = None
+    provider: Optional[str] = None
+    notifications: Optional[Dict[str, Optional[bool]]] = None
+
+def _profile_from_claims(claims: dict, provider: str) -> dict:
+    """Profile fields carried by the ID token itself"""
+    return {
+        'userId': claims['uid'],
+        'name': claims.get('name') or '',
+        'email': claims.get('email') or '',
+        'photoURL': claims.get('picture') or None,
+        'provider': provider
+    }
+
+async def _known_profile(uid: str, user_ref) -> Optional[dict]:
+    """Last profile fields written for uid: from memory, else one document read"""
+    known = known_profiles.get(uid)
+    if known is None:
+        doc = await user_ref.get()
+        if doc.exists:
+            data = doc.to_dict()
+            known = {field: data.get(field) for field in PROFILE_FIELDS + ('lastLoginAt',)}
+            known_profiles.set(uid, known)
+    return known
+
 @router.post("/auth/verify-token", response_model=UserProfile)
 async def verify_auth_token(auth_request: AuthRequest):
-    """Verify ID token and create/update user in Firebase"""
+    """Verify ID token and create/update user in Firebase
+
+    Returning users are built from token claims alone and only written when a
+    field changed or lastLoginAt is older than LOGIN_REFRESH_INTERVAL.
+    """
     headers = {
         "Cross-Origin-Opener-Policy": "same-origin-allow-popups",
         "Cross-Origin-Embedder-Policy": "require-corp"
     }
     try:
         # Verify the ID token
-        decoded_token = auth.verify_id_token(auth_request.token)
+        decoded_token = await token_cache.verify(auth_request.token)
         uid = decoded_token['uid']
-        
-        # Get user info
-        user = auth.get_user(uid)
-        
-        # Update or create user profile in Firestore
+        login_metrics['logins'] += 1
+
         user_ref = db.collection('users').document(uid)
-        
-        user_data = {
-            'userId': uid,
-            'name': user.display_name or '',
-            'email': user.email or '',
-            'photoURL': user.photo_url or None,
-            'provider': auth_request.provider,
-            'lastLoginAt': datetime.datetime.now(),
-            'metadata': {
+        profile = _profile_from_claims(decoded_token, auth_request.provider)
+        known = await _known_profile(uid, user_ref)
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        if known is None:
+            # First login: account metadata is only available from Firebase Auth
+            user = await asyncio.to_thread(auth.get_user, uid)
+            login_metrics['getUserCalls'] += 1
+            profile['name'] = profile['name'] or user.display_name or ''
+            profile['email'] = profile['email'] or user.email or ''
+            profile['photoURL'] = profile['photoURL'] or user.photo_url or None
+            update = {**profile, 'lastLoginAt': now, 'metadata': {
                 'createdAt': user.user_metadata.creation_timestamp,
                 'lastSignInAt': user.user_metadata.last_sign_in_timestamp
-            }
-        }
-        
+            }}
+        else:
+            # Claims can omit fields (e.g. no email from some providers); keep what is stored then
+            profile = {field: value or known.get(field) for field, value in profile.items()}
+            changed = {field: value for field, value in profile.items() if known.get(field) != value}
+            last_login = known.get('lastLoginAt')
+            stale = not isinstance(last_login, datetime.datetime) or \
+                (now - last_login).total_seconds() >= LOGIN_REFRESH_INTERVAL
+            if not changed and not stale:
+                login_metrics['writesSkipped'] += 1
+                return UserProfile(**profile, lastLoginAt=last_login)
+            update = {**changed, 'lastLoginAt': now}
+            if 'auth_time' in decoded_token:
+                update['metadata'] = {'lastSignInAt': decoded_token['auth_time'] * 1000}
+
         # Use set with merge to update existing or create new
-        user_ref.set(user_data, merge=True)
-        
+        await user_ref.set(update, merge=True)
+        login_metrics['writes'] += 1
+        known_profiles.set(uid, {**profile, 'lastLoginAt': now})
+
         # Return the user data with COOP headers
-        return UserProfile(**user_data)
-        user_ref.set(user_data, merge=True)
-        
-        return {
-            'success': True,
-            'user': user_data,
-            'message': 'Authentication successful'
-        }
-        
+        return UserProfile(**profile, lastLoginAt=now)
+
     except auth.InvalidIdTokenError:
         raise HTTPException(status_code=401, detail="Invalid authentication token")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/auth/metrics")
+async def get_login_metrics(token=Depends(require_admin)):
+    """Login write counters (admin only): writes issued versus skipped because nothing changed"""
+    return {**login_metrics, 'knownProfiles': len(known_profiles)}
+
 @router.get("/auth/user/{user_id}")
-async def get_user_profile(user_id: str):
-    """Get user profile data"""
+async def get_user_profile(request: Request, user_id: str):
+    """Get user profile data
+
+    The ETag is the document's quoted update time, so an unchanged profile
+    is answered with 304 without serializing it, and the same ETag can be
+    sent back as If-Match on PUT.
+    """
     try:
         user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
+        user_doc = await user_ref.get()
         
         if not user_doc.exists:
             raise HTTPException(status_code=404, detail="User not found")
-            
-        return {
+
+        update_time = user_doc.update_time.rfc3339()
+        etag = version_etag(update_time)
+        if etag_matches(request, etag):
+            return not_modified(etag, PROFILE_CACHE_CONTROL)
+
+        body = encode_json({
             'success': True,
-            'user': user_doc.to_dict()
-        }
+            'user': user_doc.to_dict(),
+            'updateTime': update_time
+        })
+        return Response(content=body, media_type='application/json',
+                        headers={'ETag': etag, 'Cache-Control': PROFILE_CACHE_CONTROL})
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/auth/user/{user_id}")
-async def update_user_profile(user_id: str, profile: UserProfile):
-    """Update user profile data"""
+async def update_user_profile(
+    user_id: str,
+    profile: UserProfileUpdate,
+    fields: Optional[str] = None,
+    if_match: Optional[str] = Header(None)
+):
+    """Update user profile data
+
+    One conditional write: 404 if the profile does not exist. ?fields=
+    limits the update to those field paths: a listed path sent as null is
+    deleted, one not sent is left alone, and one outside the profile's
+    fields is a 400. An If-Match header with the ETag from a previous GET
+    makes it fail with 412 if the profile changed since (or if the header
+    is not an ETag this endpoint issued).
+    """
     try:
-        user_ref = db.collection('users').document(user_id)
-        
-        if not user_ref.get().exists:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        # Update the user profile
-        user_ref.update(profile.dict(exclude_unset=True))
-        
+        expected_update_time = if_match_version(if_match)
+    except ValueError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+
+    try:
+        result = await update_profile(
+            user_id,
+            profile.dict(exclude_unset=True),
+            field_mask=parse_fields(fields),
+            expected_update_time=expected_update_time,
+            allowed_fields=UserProfileUpdate.model_fields
+        )
+        known_profiles.delete(user_id)
+
         return {
             'success': True,
-            'message': 'Profile updated successfully'
+            'message': 'Profile updated successfully',
+            'updateTime': result['updateTime']
         }
-        
+
+    except InvalidFieldPathError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except ProfileConflictError as e:
+        raise HTTPException(status_code=412, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from typing import List, Optional
-from pydantic import BaseModel
+import asyncio
+import os
+from pydantic import BaseModel, Field
 from datetime import datetime
-from firebase_admin import firestore
-from ..firebase_service import get_db
+from firebase_admin import firestore, firestore_async
+from google.api_core.exceptions import AlreadyExists
+from database import get_db, get_documents
+from routes.firebase_routes import require_admin, verify_token
+from utils.business_keys import saved_business_id
+from utils.firestore_batches import commit_batches
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_query, parse_fields
+from utils.http_cache import conditional_response, encode_json, make_etag
+from utils.category_counters import category_of, count_deltas, counts_ref, read_counts, reconcile_user_counts
+from utils.saved_business_cache import invalidate_saved_cache, saved_businesses_cache, saved_cache_generations
 
 router = APIRouter()
 
@@ -24,25 +34,42 @@ class SavedBusiness(BaseModel):
     docId: Optional[str] = None
     isSaved: Optional[bool] = None
 
+# Bulk requests act on the caller's own saves, at most one Firestore batch of them
+BULK_MAX_DOC_IDS = 500
+
+class BulkUnsaveRequest(BaseModel):
+    docIds: List[str] = Field(..., min_length=1, max_length=BULK_MAX_DOC_IDS)
+
+class BulkCategoryUpdateRequest(BaseModel):
+    docIds: List[str] = Field(..., min_length=1, max_length=BULK_MAX_DOC_IDS)
+    newCategory: str
+
+def _authorize_user(token: dict, user_id: str):
+    """403 unless the verified caller is user_id"""
+    if token['uid'] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+def _saved_business_ref(db, business: SavedBusiness):
+    """Deterministic document reference for a user's saved business"""
+    doc_id = saved_business_id(business.userId, business.businessInfo.name, business.businessInfo.address)
+    return db.collection('savedBusinesses').document(doc_id)
+
 @router.post("/businesses/check-saved")
-async def check_business_saved(business: SavedBusiness):
+async def check_business_saved(business: SavedBusiness, token=Depends(verify_token)):
     """Check if a business is already saved by the user"""
+    _authorize_user(token, business.userId)
     try:
         db = get_db()
-        query = db.collection('savedBusinesses').where('userId', '==', business.userId)
-        businesses = query.get()
+        doc = await _saved_business_ref(db, business).get()
         
-        for doc in businesses:
+        if doc.exists:
             data = doc.to_dict()
-            saved_business = data['businessInfo']
-            if (saved_business['name'].lower() == business.businessInfo.name.lower() and 
-                saved_business['address'].lower() == business.businessInfo.address.lower()):
-                return {
-                    'exists': True,
-                    'docId': doc.id,
-                    'savedAt': data.get('savedAt'),
-                    'message': 'Business already saved'
-                }
+            return {
+                'exists': True,
+                'docId': doc.id,
+                'savedAt': data.get('savedAt'),
+                'message': 'Business already saved'
+            }
         
         return {
             'exists': False,
@@ -53,158 +80,244 @@ async def check_business_saved(business: SavedBusiness):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/businesses/save")
-async def save_business(business: SavedBusiness):
+async def save_business(business: SavedBusiness, token=Depends(verify_token)):
     """Save a new business for a user"""
+    _authorize_user(token, business.userId)
     try:
         db = get_db()
-        # First check if it exists
-        check_result = await check_business_saved(business)
-        
-        if check_result['exists']:
-            return check_result
-            
-        # Add new business
-        doc_ref = db.collection('savedBusinesses').document()
+        doc_ref = _saved_business_ref(db, business)
         business_dict = business.dict()
         business_dict['docId'] = doc_ref.id
         business_dict['isSaved'] = True
         business_dict['savedAt'] = firestore.SERVER_TIMESTAMP
         
-        doc_ref.set(business_dict)
+        # create() fails if the document exists, so the existence check and the write are one round trip.
+        # The category counter is bumped in the same atomic batch.
+        batch = db.batch()
+        batch.create(doc_ref, business_dict)
+        batch.set(counts_ref(db, business.userId),
+                  count_deltas({business.businessInfo.category: 1}), merge=True)
+        try:
+            await batch.commit()
+        except AlreadyExists:
+            return await check_business_saved(business, token)
         
+        invalidate_saved_cache(business.userId)
         return {
             'success': True,
             'docId': doc_ref.id,
             'message': 'Business saved successfully'
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@firestore_async.async_transactional
+async def _unsave_in_transaction(transaction, db, doc_ref, user_id: str):
+    doc = await doc_ref.get(transaction=transaction)
+    
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Saved business not found")
+        
+    data = doc.to_dict()
+    if data['userId'] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to remove this saved business")
+        
+    transaction.delete(doc_ref)
+    transaction.set(counts_ref(db, user_id),
+                    count_deltas({category_of(data.get('businessInfo')): -1}), merge=True)
+
 @router.delete("/businesses/{doc_id}")
-async def unsave_business(doc_id: str, user_id: str):
-    """Remove a saved business"""
+async def unsave_business(doc_id: str, token=Depends(verify_token)):
+    """Remove one of the caller's saved businesses"""
+    user_id = token['uid']
     try:
         db = get_db()
         doc_ref = db.collection('savedBusinesses').document(doc_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Saved business not found")
-            
-        data = doc.to_dict()
-        if data['userId'] != user_id:
-            raise HTTPException(status_code=403, detail="Not authorized to remove this saved business")
-            
-        doc_ref.delete()
+        await _unsave_in_transaction(db.transaction(), db, doc_ref, user_id)
+        invalidate_saved_cache(user_id)
         
         return {
             'success': True,
             'message': 'Business removed from saved list'
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _business_page(docs) -> list:
+    """Shape one page of saved-business snapshots for the response"""
+    page = []
+    for doc in docs:
+        business_data = doc.to_dict()
+        business_data['docId'] = doc.id
+        business_data['isSaved'] = True
+        page.append(business_data)
+    return page
+
+async def _cached_business_page(request: Request, user_id: str, cache_key: tuple, query,
+                                limit: int, start_after: Optional[str], fields: Optional[str]):
+    """Serve a saved-business page from the per-user cache, loading it from Firestore on a miss"""
+    cached = saved_businesses_cache.get(cache_key)
+    if cached is None:
+        generation = saved_cache_generations.get(user_id)
+        db = get_db()
+        docs, next_cursor = await paginate_query(db.collection('savedBusinesses'), query, limit,
+                                                 start_after, parse_fields(fields))
+        body = encode_json({
+            'success': True,
+            'businesses': _business_page(docs),
+            'nextCursor': next_cursor
+        })
+        cached = (body, make_etag(body))
+        if saved_cache_generations.get(user_id) == generation:
+            saved_businesses_cache.set(cache_key, cached, tag=user_id)
+    body, etag = cached
+    return conditional_response(request, body, etag)
+
 @router.get("/businesses/saved/{user_id}")
-async def get_saved_businesses(user_id: str):
-    """Get all saved businesses for a user"""
+async def get_saved_businesses(
+    request: Request,
+    user_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    start_after: Optional[str] = None,
+    fields: Optional[str] = None,
+    token=Depends(verify_token)
+):
+    """Get a page of saved businesses for a user, newest first"""
+    _authorize_user(token, user_id)
     try:
         db = get_db()
         query = db.collection('savedBusinesses').where('userId', '==', user_id)
-        businesses = query.get()
-        
-        saved_businesses = []
-        for doc in businesses:
-            business_data = doc.to_dict()
-            business_data['docId'] = doc.id
-            business_data['isSaved'] = True
-            saved_businesses.append(business_data)
-            
-        return {
-            'success': True,
-            'businesses': saved_businesses
-        }
+        cache_key = ('saved', user_id, limit, start_after, fields)
+        return await _cached_business_page(request, user_id, cache_key, query, limit, start_after, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@firestore_async.async_transactional
+async def _recategorize_in_transaction(transaction, db, doc_ref, user_id: str, new_category: str):
+    doc = await doc_ref.get(transaction=transaction)
+    
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Saved business not found")
+        
+    data = doc.to_dict()
+    if data['userId'] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this business")
+        
+    transaction.update(doc_ref, {
+        'businessInfo.category': new_category,
+        'updatedAt': firestore.SERVER_TIMESTAMP
+    })
+    old_category = category_of(data.get('businessInfo'))
+    if old_category != new_category:
+        transaction.set(counts_ref(db, user_id),
+                        count_deltas({old_category: -1, new_category: 1}), merge=True)
+
 @router.put("/businesses/{doc_id}/update-category")
-async def update_business_category(doc_id: str, user_id: str, new_category: str):
-    """Update the category of a saved business"""
+async def update_business_category(doc_id: str, new_category: str, token=Depends(verify_token)):
+    """Update the category of one of the caller's saved businesses"""
+    user_id = token['uid']
     try:
         db = get_db()
         doc_ref = db.collection('savedBusinesses').document(doc_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Saved business not found")
-            
-        data = doc.to_dict()
-        if data['userId'] != user_id:
-            raise HTTPException(status_code=403, detail="Not authorized to update this business")
-            
-        doc_ref.update({
-            'businessInfo.category': new_category,
-            'updatedAt': firestore.SERVER_TIMESTAMP
-        })
+        await _recategorize_in_transaction(db.transaction(), db, doc_ref, user_id, new_category)
+        invalidate_saved_cache(user_id)
         
         return {
             'success': True,
             'message': 'Business category updated successfully'
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/businesses/category-counts/{user_id}")
+async def get_category_counts(user_id: str, token=Depends(verify_token)):
+    """Get a user's saved-business counts per category from the summary document"""
+    _authorize_user(token, user_id)
+    try:
+        db = get_db()
+        return {
+            'success': True,
+            **(await read_counts(db, user_id))
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/businesses/category-counts/{user_id}/reconcile")
+async def reconcile_category_counts(user_id: str, token=Depends(require_admin)):
+    """Recount a user's saved businesses and repair the category summary if it drifted (admin only)"""
+    try:
+        db = get_db()
+        return {
+            'success': True,
+            **(await reconcile_user_counts(db, user_id))
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/businesses/by-category/{user_id}/{category}")
-async def get_businesses_by_category(user_id: str, category: str):
-    """Get all saved businesses in a specific category for a user"""
+async def get_businesses_by_category(
+    request: Request,
+    user_id: str,
+    category: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    start_after: Optional[str] = None,
+    fields: Optional[str] = None,
+    token=Depends(verify_token)
+):
+    """Get a page of saved businesses in a specific category for a user, newest first"""
+    _authorize_user(token, user_id)
     try:
         db = get_db()
         query = (db.collection('savedBusinesses')
                 .where('userId', '==', user_id)
                 .where('businessInfo.category', '==', category))
-        businesses = query.get()
-        
-        category_businesses = []
-        for doc in businesses:
-            business_data = doc.to_dict()
-            business_data['docId'] = doc.id
-            business_data['isSaved'] = True
-            category_businesses.append(business_data)
-            
-        return {
-            'success': True,
-            'businesses': category_businesses
-        }
+        cache_key = ('category', user_id, category, limit, start_after, fields)
+        return await _cached_business_page(request, user_id, cache_key, query, limit, start_after, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/businesses/batch-save")
-async def batch_save_businesses(businesses: List[SavedBusiness]):
+async def batch_save_businesses(businesses: List[SavedBusiness], token=Depends(verify_token)):
     """Batch save multiple businesses for a user"""
+    for business in businesses:
+        _authorize_user(token, business.userId)
     try:
         db = get_db()
-        batch = db.batch()
-        results = []
+        refs = [_saved_business_ref(db, business) for business in businesses]
         
-        for business in businesses:
-            # Check if already saved
-            check_result = await check_business_saved(business)
-            if check_result['exists']:
+        # One batched read of every candidate id instead of a saved-list scan per business
+        existing = {doc.id: doc for doc in (await get_documents(refs)).values() if doc.exists}
+        
+        results = []
+        operations = []
+        pending = {}
+        for business, doc_ref in zip(businesses, refs):
+            if doc_ref.id in existing or doc_ref.id in pending:
                 results.append({
                     'business': business.businessInfo.name,
                     'status': 'skipped',
                     'message': 'Already saved',
-                    'docId': check_result['docId']
+                    'docId': doc_ref.id
                 })
                 continue
                 
-            # Add to batch
-            doc_ref = db.collection('savedBusinesses').document()
             business_dict = business.dict()
             business_dict['docId'] = doc_ref.id
             business_dict['isSaved'] = True
             business_dict['savedAt'] = firestore.SERVER_TIMESTAMP
             
-            batch.set(doc_ref, business_dict)
+            pending[doc_ref.id] = len(results)
+            operations.append(lambda batch, ref=doc_ref, data=business_dict: batch.set(ref, data))
             results.append({
                 'business': business.businessInfo.name,
                 'status': 'saved',
@@ -212,12 +325,145 @@ async def batch_save_businesses(businesses: List[SavedBusiness]):
                 'docId': doc_ref.id
             })
             
-        # Commit batch
-        batch.commit()
+        # Commit in Firestore-sized chunks, concurrently
+        errors = await commit_batches(db, operations)
+        for result_index, error in zip(pending.values(), errors):
+            if error is not None:
+                results[result_index]['status'] = 'failed'
+                results[result_index]['message'] = f'Save failed: {str(error)}'
+        
+        # Counters for everything that committed, one write per user.
+        # A crash between the two steps leaves drift for the reconciliation job to repair.
+        saved_counts = {}
+        for result_index, error in zip(pending.values(), errors):
+            if error is None:
+                business = businesses[result_index]
+                user_counts = saved_counts.setdefault(business.userId, {})
+                category = business.businessInfo.category
+                user_counts[category] = user_counts.get(category, 0) + 1
+        await asyncio.gather(*(
+            counts_ref(db, user_id).set(count_deltas(deltas), merge=True)
+            for user_id, deltas in saved_counts.items()
+        ))
+        
+        for user_id in {business.userId for business in businesses}:
+            invalidate_saved_cache(user_id)
         
         return {
-            'success': True,
+            'success': all(r['status'] != 'failed' for r in results),
             'results': results
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _load_owned_businesses(db, user_id: str, doc_ids: List[str]):
+    """Verify ownership of many saved businesses with one batched read.
+
+    Returns the owned documents' snapshots keyed by doc id, plus a result
+    entry (in request order) for every id, pre-filled for missing, foreign
+    or repeated ones.
+    """
+    collection = db.collection('savedBusinesses')
+    docs = await get_documents(collection.document(doc_id) for doc_id in doc_ids)
+    
+    owned = {}
+    results = []
+    seen = set()
+    for doc_id in doc_ids:
+        doc = docs.get(collection.document(doc_id).path)
+        if doc_id in seen:
+            results.append({'docId': doc_id, 'status': 'skipped', 'message': 'Duplicate id in request'})
+        elif doc is None or not doc.exists:
+            results.append({'docId': doc_id, 'status': 'not_found', 'message': 'Saved business not found'})
+        elif doc.to_dict().get('userId') != user_id:
+            results.append({'docId': doc_id, 'status': 'forbidden', 'message': 'Not authorized for this saved business'})
+        else:
+            owned[doc_id] = doc
+            results.append({'docId': doc_id, 'status': 'pending', 'message': ''})
+        seen.add(doc_id)
+    return owned, results
+
+async def _apply_bulk_writes(db, user_id: str, owned: dict, results: list, make_operation,
+                             category_deltas, success_message: str):
+    """Commit one write per owned document in chunks and fill in per-item results
+
+    Each write is conditional on the document being unchanged since the
+    ownership read, so a document deleted or edited in between fails
+    (with the rest of its chunk) instead of skewing the category counts.
+    """
+    doc_ids = list(owned.keys())
+    collection = db.collection('savedBusinesses')
+    operations = [
+        make_operation(collection.document(doc_id), db.write_option(last_update_time=owned[doc_id].update_time))
+        for doc_id in doc_ids
+    ]
+    errors = dict(zip(doc_ids, await commit_batches(db, operations)))
+    
+    deltas = {}
+    for result in results:
+        if result['status'] != 'pending':
+            continue
+        error = errors[result['docId']]
+        if error is not None:
+            result['status'] = 'failed'
+            result['message'] = f'Write failed: {str(error)}'
+            continue
+        result['status'] = 'success'
+        result['message'] = success_message
+        for category, delta in category_deltas(owned[result['docId']].to_dict()).items():
+            deltas[category] = deltas.get(category, 0) + delta
+    
+    if any(deltas.values()):
+        await counts_ref(db, user_id).set(count_deltas(deltas), merge=True)
+    if doc_ids:
+        invalidate_saved_cache(user_id)
+    
+    # Repeated ids are no-ops, not failures
+    return {
+        'success': all(r['status'] in ('success', 'skipped') for r in results),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'results': results
+    }
+
+@router.post("/businesses/bulk-unsave")
+async def bulk_unsave_businesses(request: BulkUnsaveRequest, token=Depends(verify_token)):
+    """Remove many of the caller's saved businesses at once"""
+    user_id = token['uid']
+    try:
+        db = get_db()
+        owned, results = await _load_owned_businesses(db, user_id, request.docIds)
+        return await _apply_bulk_writes(
+            db, user_id, owned, results,
+            make_operation=lambda ref, option: (lambda batch: batch.delete(ref, option=option)),
+            category_deltas=lambda data: {category_of(data.get('businessInfo')): -1},
+            success_message='Business removed from saved list'
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/businesses/bulk-update-category")
+async def bulk_update_business_category(request: BulkCategoryUpdateRequest, token=Depends(verify_token)):
+    """Move many of the caller's saved businesses to a new category at once"""
+    user_id = token['uid']
+    try:
+        db = get_db()
+        owned, results = await _load_owned_businesses(db, user_id, request.docIds)
+        update = {
+            'businessInfo.category': request.newCategory,
+            'updatedAt': firestore.SERVER_TIMESTAMP
+        }
+        
+        def category_deltas(data):
+            old_category = category_of(data.get('businessInfo'))
+            if old_category == request.newCategory:
+                return {}
+            return {old_category: -1, request.newCategory: 1}
+        
+        return await _apply_bulk_writes(
+            db, user_id, owned, results,
+            make_operation=lambda ref, option: (lambda batch: batch.update(ref, update, option=option)),
+            category_deltas=category_deltas,
+            success_message='Business category updated successfully'
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,20 +1,24 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import Optional
+from fastapi.responses import StreamingResponse
+import asyncio
+from typing import List, Optional
 from datetime import datetime
-from .models import UserProfile, BusinessData, CategoryCreate, ActivityLog, SearchQuery
-from .firebase_admin import (
-    verify_firebase_token,
-    get_user_profile,
-    update_user_profile,
-    save_business,
-    get_saved_businesses
-)
-from .utils.analytics import (
+from models import UserProfile, BusinessData, CategoryCreate, ActivityLog, SearchQuery
+from firebase_init import get_user_profile, update_user_profile, ProfileNotFoundError
+from services.firebase_service import firebase_service
+from routes.firebase_routes import require_admin, verify_token
+from utils.analytics import (
     update_analytics_counters,
     get_analytics_report,
     get_category_performance,
-    cleanup_old_logs
+    cleanup_old_logs,
+    get_cleanup_progress,
+    get_search_heatmap
 )
+from database import get_db
+from utils.analytics_rollups import compact_analytics
+from utils.exports import EXPORT_COLLECTIONS, EXPORT_FORMATS, export_stream
+from utils.search_heatmap import key_matches_range
 
 router = APIRouter(prefix="/api/v1")
 
@@ -22,7 +26,7 @@ router = APIRouter(prefix="/api/v1")
 @router.get("/admin/analytics/report")
 async def get_admin_report(
     days: int = Query(7, ge=1, le=90),
-    token=Depends(verify_token)
+    token=Depends(require_admin)
 ):
     """
     Get detailed analytics report
@@ -32,7 +36,6 @@ async def get_admin_report(
     - API usage
     - Recent activities
     """
-    # Add admin check here
     try:
         report = await get_analytics_report(days)
         return report
@@ -43,7 +46,7 @@ async def get_admin_report(
 async def get_category_metrics(
     category_id: str,
     days: int = Query(30, ge=1, le=90),
-    token=Depends(verify_token)
+    token=Depends(require_admin)
 ):
     """
     Get detailed performance metrics for a specific category
@@ -75,6 +78,8 @@ async def update_user_profile_enhanced(
     try:
         result = await update_user_profile(uid, profile.dict(exclude_unset=True))
         return result
+    except ProfileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -91,15 +96,72 @@ async def batch_save_businesses(
     - Returns saved IDs
     """
     try:
-        saved_ids = []
-        for business in businesses:
-            result = await save_business(token["uid"], business.dict())
-            saved_ids.append(result["id"])
+        results = await asyncio.gather(*(
+            firebase_service.save_business(token["uid"], business.dict())
+            for business in businesses
+        ))
+        saved_ids = [result["id"] for result in results]
         await update_analytics_counters("business_save", {"count": len(businesses)})
         return {"saved_ids": saved_ids}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/admin/analytics/search-heatmap")
+async def get_admin_search_heatmap(
+    range_name: str = Query("week", alias="range", pattern="^(week|month|all)$"),
+    key: Optional[str] = Query(None, pattern=r"^\d{4}-(W\d{2}|\d{2})$"),
+    category: Optional[str] = None,
+    token=Depends(require_admin)
+):
+    """
+    Search volume by day of week and hour of day
+    - 7x24 matrix, Monday first
+    - Current week or month unless key (2025-W07 / 2025-02) is given
+    - Overall plus per category, or one category
+    """
+    if key and not key_matches_range(range_name, key):
+        raise HTTPException(status_code=400, detail=f"key {key!r} does not name a {range_name} heatmap")
+    try:
+        return await get_search_heatmap(range_name, key, category)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Data Export
+@router.get("/admin/export/{collection}")
+async def export_collection(
+    collection: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+    token=Depends(require_admin)
+):
+    """
+    Stream a collection as CSV or NDJSON
+    - activityLogs, searchQueries or savedBusinesses
+    - Optional time range and user filter
+    - Optional gzip compression
+    """
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {collection}")
+
+    order_field, _ = EXPORT_COLLECTIONS[collection]
+    query = get_db().collection(collection)
+    if user_id:
+        query = query.where('userId', '==', user_id)
+    if start:
+        query = query.where(order_field, '>=', start)
+    if end:
+        query = query.where(order_field, '<', end)
+
+    filename = f"{collection}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_stream(query, collection, format, gzip=gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # Search and Category Management
 @router.post("/search/log")
 async def log_search_query(
@@ -122,16 +184,38 @@ async def log_search_query(
 @router.post("/admin/maintenance/cleanup-logs")
 async def trigger_log_cleanup(
     days_to_keep: int = Query(90, ge=30, le=365),
-    token=Depends(verify_token)
+    token=Depends(require_admin)
 ):
     """
     Cleanup old activity logs
     - Removes logs older than specified days
     - Updates analytics
     """
-    # Add admin check here
     try:
         result = await cleanup_old_logs(days_to_keep)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/admin/maintenance/cleanup-logs/progress")
+async def get_log_cleanup_progress(token=Depends(require_admin)):
+    """
+    Progress of the current or last log cleanup
+    - Documents deleted so far and the resume cursor
+    """
+    try:
+        return await get_cleanup_progress()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/admin/maintenance/compact-analytics")
+async def trigger_analytics_compaction(token=Depends(require_admin)):
+    """
+    Compact analytics counters
+    - Folds settled days' shards into daily rollups
+    - Folds old days into weekly and monthly rollups
+    """
+    try:
+        return await compact_analytics(get_db())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,27 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from pydantic import BaseModel, Field
 from typing import Dict, List, Optional
-from firebase_admin import verify_firebase_token
-from .firebase_admin import (
-    get_user_profile,
-    update_user_profile,
-    get_categories,
-    add_category,
-    save_business,
-    get_saved_businesses,
-    log_activity,
-    get_analytics
-)
+from models import ActivityLog
+from firebase_init import verify_firebase_token, get_user_profile, update_user_profile, ProfileNotFoundError, InvalidFieldPathError
+from services.firebase_service import firebase_service
+from utils.analytics import get_analytics_report
+from utils.activity_queue import QueueFullError, activity_log_queue
+from utils.http_cache import conditional_response
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields
 
 router = APIRouter()
 
+# The in-process snapshot is live, so browsers revalidate every time; a match costs nothing
+CATEGORIES_CACHE_CONTROL = "private, no-cache"
+
+class ActivityLogBatch(BaseModel):
+    activities: List[ActivityLog] = Field(..., min_length=1, max_length=500)
+
 # Auth Middleware
 async def verify_token(authorization: str):
     try:
         token = authorization.replace("Bearer ", "")
-        return verify_firebase_token(token)
+        return await verify_firebase_token(token)
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def require_admin(token=Depends(verify_token)):
+    """Decoded token of a caller holding the `admin` custom claim; 403 for anyone else."""
+    if not token.get('admin'):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return token
+
 # Auth Routes
 @router.post("/auth/verify")
 async def verify_auth(authorization: str):
@@ -49,23 +58,30 @@ async def update_user(uid: str, data: Dict, token=Depends(verify_token)):
             raise HTTPException(status_code=403, detail="Not authorized")
         result = await update_user_profile(uid, data)
         return result
+    except HTTPException:
+        raise
+    except InvalidFieldPathError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Category Routes
 @router.get("/categories")
-async def list_categories(token=Depends(verify_token)):
+async def list_categories(request: Request, token=Depends(verify_token)):
+    # Served from the live categories store: no Firestore read and no serialization per request
     try:
-        categories = await get_categories()
-        return categories
+        snapshot = await firebase_service.get_categories_snapshot()
+        return conditional_response(request, snapshot['body'], snapshot['etag'],
+                                    cache_control=CATEGORIES_CACHE_CONTROL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/admin/categories")
-async def create_category(data: Dict, token=Depends(verify_token)):
-    # Add admin check here
+async def create_category(data: Dict, token=Depends(require_admin)):
     try:
-        category = await add_category(data)
+        category = await firebase_service.add_category(data)
         return category
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -74,18 +90,28 @@ async def create_category(data: Dict, token=Depends(verify_token)):
 @router.post("/businesses/save")
 async def save_business_for_user(business_data: Dict, token=Depends(verify_token)):
     try:
-        result = await save_business(token["uid"], business_data)
+        result = await firebase_service.save_business(token["uid"], business_data)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/businesses/saved/{uid}")
-async def get_user_saved_businesses(uid: str, token=Depends(verify_token)):
+async def get_user_saved_businesses(
+    uid: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    start_after: Optional[str] = None,
+    fields: Optional[str] = None,
+    token=Depends(verify_token)
+):
+    """A page of the user's saved businesses, newest first; pass nextCursor as start_after for the next one"""
     try:
         if token["uid"] != uid:
             raise HTTPException(status_code=403, detail="Not authorized")
-        businesses = await get_saved_businesses(uid)
-        return businesses
+        return await firebase_service.get_saved_businesses(uid, limit, start_after, parse_fields(fields))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -93,16 +119,28 @@ async def get_user_saved_businesses(uid: str, token=Depends(verify_token)):
 @router.post("/activities/log")
 async def log_user_activity(activity_data: Dict, token=Depends(verify_token)):
     try:
-        result = await log_activity({**activity_data, "userId": token["uid"]})
+        result = await firebase_service.log_activity({**activity_data, "userId": token["uid"]})
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/activities/log/batch", status_code=202)
+async def log_user_activities(batch: ActivityLogBatch, token=Depends(verify_token)):
+    # Written by the background queue writer; 503 + Retry-After tells the client to back off
+    try:
+        accepted = activity_log_queue.enqueue([
+            {**activity.dict(), "userId": token["uid"]} for activity in batch.activities
+        ])
+        return {"accepted": accepted, "status": "queued"}
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/admin/analytics")
-async def get_admin_analytics(token=Depends(verify_token)):
-    # Add admin check here
+async def get_admin_analytics(token=Depends(require_admin)):
     try:
-        analytics = await get_analytics()
+        analytics = await get_analytics_report()
         return analytics
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
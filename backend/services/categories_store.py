@@ -0,0 +1,153 @@
+"""Process-wide, live copy of the categories collection
+
+Categories are few and change rarely but are read on almost every page load,
+so every category read is served from memory. The store is loaded at startup
+and kept current by a Firestore snapshot listener. The async client has no
+listeners, so the sync client's Watch runs in its own thread and hands each
+snapshot to the event loop. If the listener cannot be started, or stops
+streaming, the store polls the collection every CATEGORIES_POLL_INTERVAL
+seconds instead.
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional
+from firebase_admin import firestore
+from database import get_db, initialize_firebase_app, stream_to_list
+from utils.http_cache import encode_json, make_etag
+
+CATEGORIES_COLLECTION = 'categories'
+
+
+def _name_key(name) -> str:
+    return str(name or '').strip().lower()
+
+
+class CategoriesStore:
+    def __init__(self):
+        self.use_listener = os.getenv('CATEGORIES_LISTENER', 'true').strip().lower() in ('1', 'true', 'yes')
+        self.poll_interval = float(os.getenv('CATEGORIES_POLL_INTERVAL', 60))
+        self._by_id: Dict[str, dict] = {}
+        self._by_name: Dict[str, dict] = {}
+        self._categories: List[dict] = []
+        self._body = encode_json([])
+        self._etag = make_etag(self._body)
+        self._loaded = asyncio.Event()
+        self._load_lock = asyncio.Lock()
+        self._loop = None
+        self._watch = None
+        self._task = None
+        self._metrics = {'listenerUpdates': 0, 'polls': 0, 'pollErrors': 0, 'listenerErrors': 0}
+
+    def _replace(self, categories: List[dict], source: str):
+        """Swap in a complete new set of categories (always on the event loop)."""
+        categories = sorted(categories, key=lambda cat: cat['id'])
+        body = encode_json(categories)
+        self._categories = categories
+        self._by_id = {cat['id']: cat for cat in categories}
+        self._by_name = {_name_key(cat.get('name')): cat for cat in categories if cat.get('name')}
+        self._body, self._etag = body, make_etag(body)
+        self._metrics['listenerUpdates' if source == 'listener' else 'polls'] += 1
+        self._loaded.set()
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # Called on the listener's thread, which can outlive the event loop at shutdown
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        categories = [{'id': doc.id, **doc.to_dict()} for doc in docs]
+        try:
+            loop.call_soon_threadsafe(self._replace, categories, 'listener')
+        except RuntimeError:
+            # The loop closed between the check and the call
+            pass
+
+    async def refresh(self):
+        """Reload the whole collection now (polling, and read-your-writes after an edit)."""
+        docs = await stream_to_list(get_db().collection(CATEGORIES_COLLECTION))
+        self._replace([{'id': doc.id, **doc.to_dict()} for doc in docs], 'poll')
+
+    @property
+    def listening(self) -> bool:
+        """True while the snapshot listener is streaming updates."""
+        return self._watch is not None and self._watch.is_active
+
+    def _start_listener(self):
+        try:
+            initialize_firebase_app()
+            self._watch = firestore.client().collection(CATEGORIES_COLLECTION).on_snapshot(self._on_snapshot)
+        except Exception as e:
+            self._metrics['listenerErrors'] += 1
+            self._watch = None
+            print(f"[CATEGORIES] Snapshot listener unavailable, polling every {self.poll_interval}s: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self.listening:
+                if self._watch is not None:
+                    self._metrics['listenerErrors'] += 1
+                    print("[CATEGORIES] Snapshot listener stopped streaming, polling until it is restarted")
+                    self._watch.unsubscribe()
+                    self._watch = None
+                if self.use_listener:
+                    self._start_listener()
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    self._metrics['pollErrors'] += 1
+                    print(f"[CATEGORIES] Poll failed: {str(e)}")
+
+    async def start(self):
+        """Load the categories and keep them current; call once on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        if self.use_listener:
+            self._start_listener()
+        if self.listening:
+            try:
+                await asyncio.wait_for(self._loaded.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                print("[CATEGORIES] No initial snapshot from the listener, loading directly")
+        if not self._loaded.is_set():
+            await self.refresh()
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    async def ensure_loaded(self):
+        """Load on first use when the store was not started with the app (scripts, benchmarks)."""
+        if self._loaded.is_set():
+            return
+        # Concurrent first requests share one load instead of each reading the collection
+        async with self._load_lock:
+            if not self._loaded.is_set():
+                await self.refresh()
+
+    def all(self) -> List[dict]:
+        return self._categories
+
+    def get(self, category_id: str) -> Optional[dict]:
+        return self._by_id.get(category_id)
+
+    def get_by_name(self, name: str) -> Optional[dict]:
+        return self._by_name.get(_name_key(name))
+
+    def snapshot(self) -> dict:
+        """Categories with their pre-serialized JSON body and ETag."""
+        return {'categories': self._categories, 'body': self._body, 'etag': self._etag}
+
+    def get_metrics(self) -> dict:
+        return {**self._metrics, 'categories': len(self._categories), 'listenerActive': self.listening}
+
+
+categories_store = CategoriesStore()
@@ -1,15 +1,17 @@
-from firebase_admin import credentials, initialize_app, auth, firestore
-import os
-from pathlib import Path
+from firebase_admin import auth, firestore
+from google.api_core.exceptions import AlreadyExists
+from database import get_db
+from firebase_init import update_user_profile
+from services.categories_store import categories_store
+from utils.business_keys import saved_business_id
+from utils.category_counters import category_of, count_deltas, counts_ref
+from utils.pagination import DEFAULT_PAGE_SIZE, paginate_query
+from utils.saved_business_cache import invalidate_saved_cache
 
 class FirebaseService:
     def __init__(self):
-        # Initialize Firebase Admin
-        cred = credentials.Certificate(
-            Path(__file__).parent / "firebase-service-account.json"
-        )
-        self.app = initialize_app(cred)
-        self.db = firestore.client()
+        # Shared async client; initializes Firebase Admin on first use
+        self.db = get_db()
 
     def verify_firebase_token(self, id_token: str):
         try:
@@ -22,47 +24,82 @@ class FirebaseService:
     async def get_user_profile(self, uid: str):
         try:
             doc_ref = self.db.collection('users').document(uid)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             return doc.to_dict() if doc.exists else None
         except Exception as e:
             raise Exception(f"Error fetching user: {str(e)}")
 
-    async def update_user_profile(self, uid: str, data: dict):
-        try:
-            doc_ref = self.db.collection('users').document(uid)
-            doc_ref.set(data, merge=True)
-            return {"status": "success", "message": "Profile updated"}
-        except Exception as e:
-            raise Exception(f"Error updating user: {str(e)}")
+    async def update_user_profile(self, uid: str, data: dict, field_mask=None, expected_update_time=None):
+        # Same update-if-exists semantics as every other profile update path
+        return await update_user_profile(uid, data, field_mask=field_mask,
+                                         expected_update_time=expected_update_time)
 
     # Category Management
+    async def get_categories_snapshot(self) -> dict:
+        """Categories with their pre-serialized JSON body and ETag, from the live in-process store"""
+        await categories_store.ensure_loaded()
+        return categories_store.snapshot()
+
     async def get_categories(self):
+        await categories_store.ensure_loaded()
+        return categories_store.all()
+
+    async def add_category(self, data: dict):
         try:
-            categories = self.db.collection('categories').stream()
-            return [{"id": cat.id, **cat.to_dict()} for cat in categories]
+            doc_ref = self.db.collection('categories').document()
+            category = {**data, "createdAt": firestore.SERVER_TIMESTAMP}
+            await doc_ref.set(category)
+            if not categories_store.listening:
+                await categories_store.refresh()
+            return {"id": doc_ref.id, **data}
         except Exception as e:
-            raise Exception(f"Error fetching categories: {str(e)}")
+            raise Exception(f"Error adding category: {str(e)}")
 
     # Business Management
     async def save_business(self, uid: str, business_data: dict):
         try:
-            doc_ref = self.db.collection('savedBusinesses').document()
+            doc_id = saved_business_id(uid, business_data.get('name'), business_data.get('address'))
+            doc_ref = self.db.collection('savedBusinesses').document(doc_id)
             data = {
                 "userId": uid,
                 "businessInfo": business_data,
                 "savedAt": firestore.SERVER_TIMESTAMP
             }
-            doc_ref.set(data)
+            batch = self.db.batch()
+            batch.create(doc_ref, data)
+            batch.set(counts_ref(self.db, uid), count_deltas({category_of(business_data): 1}), merge=True)
+            try:
+                await batch.commit()
+            except AlreadyExists:
+                return {"id": doc_ref.id, **(await doc_ref.get()).to_dict()}
+            invalidate_saved_cache(uid)
             return {"id": doc_ref.id, **data}
         except Exception as e:
             raise Exception(f"Error saving business: {str(e)}")
 
-    async def get_saved_businesses(self, uid: str):
+    async def get_saved_businesses(self, uid: str, limit: int = DEFAULT_PAGE_SIZE,
+                                   start_after: str = None, fields: list = None):
         try:
-            businesses = self.db.collection('savedBusinesses').where("userId", "==", uid).stream()
-            return [{"id": bus.id, **bus.to_dict()} for bus in businesses]
+            collection = self.db.collection('savedBusinesses')
+            query = collection.where("userId", "==", uid)
+            businesses, next_cursor = await paginate_query(collection, query, limit, start_after, fields)
+            return {
+                "businesses": [{"id": bus.id, **bus.to_dict()} for bus in businesses],
+                "nextCursor": next_cursor
+            }
+        except ValueError:
+            raise  # a bad cursor is the caller's error, not a fetch failure
         except Exception as e:
             raise Exception(f"Error fetching saved businesses: {str(e)}")
 
+    # Activity Logging
+    async def log_activity(self, activity_data: dict):
+        try:
+            doc_ref = self.db.collection('activityLogs').document()
+            await doc_ref.set({**activity_data, "timestamp": firestore.SERVER_TIMESTAMP})
+            return {"id": doc_ref.id, "status": "logged"}
+        except Exception as e:
+            raise Exception(f"Error logging activity: {str(e)}")
+
 # Create a singleton instance
 firebase_service = FirebaseService()
@@ -0,0 +1,112 @@
+"""Long-lived pooled HTTP client for the Gemini fallback"""
+import os
+import threading
+import httpx
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class GeminiClient:
+    """Keeps one connection pool open to the Gemini endpoint so fallback
+    calls reuse TCP/TLS connections instead of handshaking every time."""
+
+    def __init__(self):
+        self.max_connections = _env_int('GEMINI_POOL_MAX_CONNECTIONS', 10)
+        self.max_keepalive = _env_int('GEMINI_POOL_MAX_KEEPALIVE', 5)
+        self.keepalive_expiry = _env_float('GEMINI_KEEPALIVE_EXPIRY', 60.0)
+        self.timeout = _env_float('GEMINI_TIMEOUT', 60.0)
+        self.http2 = os.getenv('GEMINI_HTTP2', 'false').strip().lower() in ('1', 'true', 'yes')
+        self._client = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'requests': 0,
+            'connectionsOpened': 0,
+            'errors': 0,
+            'http2Responses': 0
+        }
+
+    def _build_client(self):
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401  (httpx needs it for HTTP/2)
+            except ImportError:
+                print("[GEMINI HTTP] GEMINI_HTTP2 set but 'h2' is not installed - using HTTP/1.1")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        print(f"[GEMINI HTTP] Opening pool (max={self.max_connections}, keepalive={self.max_keepalive}, "
+              f"expiry={self.keepalive_expiry}s, http2={http2})")
+        return httpx.Client(limits=limits, timeout=self.timeout, http2=http2)
+
+    def start(self):
+        """Open the connection pool. Safe to call more than once."""
+        with self._lock:
+            if self._client is None:
+                self._client = self._build_client()
+
+    def close(self):
+        """Close the pool and drop all kept-alive connections."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+                print("[GEMINI HTTP] Connection pool closed")
+
+    def _trace(self, event_name: str, info: dict):
+        # httpcore emits this once per freshly opened socket; anything else was a reused connection
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self._metrics['connectionsOpened'] += 1
+
+    def post(self, url: str, headers: dict = None, json: dict = None) -> httpx.Response:
+        """POST through the shared pool, lazily opening it if startup was skipped."""
+        # Snapshot the client under the lock so a concurrent close() cannot swap it out mid-call
+        with self._lock:
+            if self._client is None:
+                self._client = self._build_client()
+            client = self._client
+            self._metrics['requests'] += 1
+        try:
+            resp = client.post(url, headers=headers, json=json, extensions={'trace': self._trace})
+        except Exception:
+            with self._lock:
+                self._metrics['errors'] += 1
+            raise
+
+        if resp.http_version == 'HTTP/2':
+            with self._lock:
+                self._metrics['http2Responses'] += 1
+        return resp
+
+    def get_metrics(self) -> dict:
+        """Connection reuse statistics for the pool."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        reused = max(metrics['requests'] - metrics['errors'] - metrics['connectionsOpened'], 0)
+        completed = metrics['requests'] - metrics['errors']
+        metrics['connectionsReused'] = reused
+        metrics['reuseRatio'] = round(reused / completed, 4) if completed > 0 else 0
+        metrics['poolOpen'] = self._client is not None
+        metrics['http2Enabled'] = self.http2
+        return metrics
+
+
+# Create a singleton instance
+gemini_client = GeminiClient()
@@ -1,6 +1,7 @@
 from firebase_admin import credentials, initialize_app, firestore
 import datetime
 import os
+from utils.business_keys import saved_business_id
 
 def initialize_firebase():
     try:
@@ -137,21 +138,17 @@ def check_business_exists(db_client, user_id, business_info):
     - None if business not found
     - Document reference if business exists
     """
-    query = db_client.collection('savedBusinesses').where('userId', '==', user_id)
-    businesses = query.get()
+    doc_id = saved_business_id(user_id, business_info['name'], business_info['address'])
+    business = db_client.collection('savedBusinesses').document(doc_id).get()
     
-    for business in businesses:
+    if business.exists:
         data = business.to_dict()
-        saved_business = data['businessInfo']
-        # Check if business name and address match
-        if (saved_business['name'].lower() == business_info['name'].lower() and 
-            saved_business['address'].lower() == business_info['address'].lower()):
-            return {
-                'exists': True,
-                'docId': business.id,
-                'savedAt': data.get('savedAt'),
-                'message': 'Business already saved'
-            }
+        return {
+            'exists': True,
+            'docId': business.id,
+            'savedAt': data.get('savedAt'),
+            'message': 'Business already saved'
+        }
     return {
         'exists': False,
         'docId': None,
@@ -256,7 +253,8 @@ def add_test_data(db_client):
             # Check if business already exists for this user
             check_result = check_business_exists(db_client, business['userId'], business['businessInfo'])
             if not check_result['exists']:
-                doc_ref = db_client.collection('savedBusinesses').document()
+                doc_id = saved_business_id(business['userId'], business['businessInfo']['name'], business['businessInfo']['address'])
+                doc_ref = db_client.collection('savedBusinesses').document(doc_id)
                 business['docId'] = doc_ref.id  # Add document ID for frontend reference
                 business['isSaved'] = True      # Add saved state for frontend
                 doc_ref.set(business)
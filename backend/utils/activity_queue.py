@@ -0,0 +1,148 @@
+"""Bounded write queue for activity log ingestion
+
+Request handlers only enqueue validated activities; a background writer
+drains the queue and commits up to one WriteBatch of logs at a time. The
+queue holds at most ACTIVITY_QUEUE_MAX_SIZE activities. A batch that does not
+fit is rejected as a whole so the caller can back off and retry it.
+
+A crash loses whatever is still queued. A failed commit is retried up to
+ACTIVITY_WRITE_MAX_ATTEMPTS times before its activities are dropped and counted.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import List
+from database import get_db
+from utils.firestore_batches import FIRESTORE_BATCH_LIMIT
+
+
+class QueueFullError(Exception):
+    """Raised when a batch of activities does not fit in the queue."""
+
+
+class ActivityLogQueue:
+    def __init__(self, db_getter):
+        self._get_db = db_getter
+        self.max_size = int(os.getenv('ACTIVITY_QUEUE_MAX_SIZE', 10000))
+        self.batch_size = min(int(os.getenv('ACTIVITY_WRITE_BATCH_SIZE', FIRESTORE_BATCH_LIMIT)), FIRESTORE_BATCH_LIMIT)
+        self.linger = float(os.getenv('ACTIVITY_WRITE_LINGER', 0.5))
+        self.max_attempts = int(os.getenv('ACTIVITY_WRITE_MAX_ATTEMPTS', 3))
+        self._queue = None
+        self._task = None
+        self._inflight = None
+        self._metrics = {'activitiesAccepted': 0, 'activitiesWritten': 0, 'activitiesDropped': 0,
+                         'batchesRejected': 0, 'commits': 0, 'commitErrors': 0}
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    def enqueue(self, activities: List[dict]) -> int:
+        """Queue activities for writing, all or none; raises QueueFullError when they don't fit."""
+        if self.queue.maxsize - self.queue.qsize() < len(activities):
+            self._metrics['batchesRejected'] += 1
+            raise QueueFullError(f"Activity queue is full ({self.queue.qsize()}/{self.queue.maxsize})")
+        received_at = datetime.now(timezone.utc)
+        for activity in activities:
+            self.queue.put_nowait(({'timestamp': received_at, **activity}, 1))
+        self._metrics['activitiesAccepted'] += len(activities)
+        return len(activities)
+
+    async def _next_batch(self) -> list:
+        """Wait for one activity, then give others up to `linger` seconds to fill the batch."""
+        items = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.linger
+        try:
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopping: hand the collected items back so drain() writes them
+            for item in items:
+                self.queue.put_nowait(item)
+            raise
+        return items
+
+    async def _write(self, items: list) -> bool:
+        db = self._get_db()
+        batch = db.batch()
+        logs = db.collection('activityLogs')
+        for activity, _ in items:
+            batch.set(logs.document(), activity)
+        try:
+            await batch.commit()
+            self._metrics['commits'] += 1
+            self._metrics['activitiesWritten'] += len(items)
+            return True
+        except Exception as e:
+            self._metrics['commitErrors'] += 1
+            retry = [(activity, attempt + 1) for activity, attempt in items if attempt < self.max_attempts]
+            dropped = len(items) - len(retry)
+            for item in retry:
+                try:
+                    self.queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    dropped += 1
+            self._metrics['activitiesDropped'] += dropped
+            print(f"[ACTIVITY] Commit of {len(items)} logs failed, re-queued {len(items) - dropped}: {str(e)}")
+            return False
+
+    async def _run(self):
+        while True:
+            items = await self._next_batch()
+            # Shielded so stopping mid-commit neither loses nor double-writes the batch; stop() awaits it
+            self._inflight = asyncio.get_running_loop().create_task(self._write(items))
+            if not await asyncio.shield(self._inflight):
+                await asyncio.sleep(max(self.linger, 1.0))
+
+    async def drain(self):
+        """Write everything queued so far; failed commits are retried until their attempts run out."""
+        while not self.queue.empty():
+            items = []
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            if not await self._write(items):
+                await asyncio.sleep(min(self.linger, 1.0))
+
+    def start(self):
+        """Start the background writer on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background writer and write out whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None:
+            # A commit that fails now re-queues its logs, so it has to finish before the final drain
+            await self._inflight
+            self._inflight = None
+        dropped = self._metrics['activitiesDropped']
+        await self.drain()
+        dropped = self._metrics['activitiesDropped'] - dropped
+        if dropped:
+            print(f"[ACTIVITY] Shutdown could not write {dropped} activity logs; they were dropped")
+
+    def get_metrics(self) -> dict:
+        return {**self._metrics, 'queued': self.queue.qsize(), 'capacity': self.queue.maxsize}
+
+
+activity_log_queue = ActivityLogQueue(get_db)
@@ -1,73 +1,140 @@
+import asyncio
+import os
+import time
 from firebase_admin import firestore
 from datetime import datetime, timedelta
 from typing import Dict, List
+from database import count_query, get_db, stream_to_list
+from services.categories_store import categories_store
+from utils import search_heatmap
+from utils.cache import LRUCache
+from utils.analytics_buffer import AnalyticsBuffer
+from utils.analytics_rollups import read_daily
+from utils.firestore_batches import delete_query_in_pages
 
-db = firestore.client()
+db = get_db()
+
+# Aggregation counts for admin reports; a short TTL keeps dashboards on auto-refresh cheap
+count_cache = LRUCache(max_entries=256, ttl_seconds=float(os.getenv('ANALYTICS_COUNT_CACHE_TTL', 60)))
+
+async def cached_count(cache_key: tuple, query) -> int:
+    """Count query results with a COUNT aggregation, cached by cache_key"""
+    count = count_cache.get(cache_key)
+    if count is None:
+        count = await count_query(query)
+        count_cache.set(cache_key, count)
+    return count
+
+# Log cleanup deletes page by page at a bounded rate and checkpoints so it can resume
+LOG_CLEANUP_PAGE_SIZE = int(os.getenv('LOG_CLEANUP_PAGE_SIZE', 1000))
+LOG_CLEANUP_CONCURRENCY = int(os.getenv('LOG_CLEANUP_CONCURRENCY', 4))
+LOG_CLEANUP_MAX_DELETES_PER_SECOND = float(os.getenv('LOG_CLEANUP_MAX_DELETES_PER_SECOND', 500))
+LOG_CLEANUP_JOB_REF = db.collection('maintenanceJobs').document('cleanupActivityLogs')
+
+# Admin reports are served stale-while-revalidate: fresh for REPORT_FRESH_SECONDS, then returned
+# as-is while one background refresh per `days` recomputes them; entries expire after the max staleness
+REPORT_FRESH_SECONDS = float(os.getenv('ANALYTICS_REPORT_FRESH_SECONDS', 30))
+REPORT_MAX_STALE_SECONDS = float(os.getenv('ANALYTICS_REPORT_MAX_STALE_SECONDS', 600))
+report_cache = LRUCache(max_entries=128, ttl_seconds=REPORT_MAX_STALE_SECONDS)
+# Refreshes re-query activity logs from REPORT_REFETCH_OVERLAP_SECONDS before the newest one already in
+# the report, since queued logs can commit after newer ones; every REPORT_FULL_REFRESH_EVERY-th refresh
+# rebuilds the activity list from scratch to pick up anything that landed even later
+REPORT_REFETCH_OVERLAP_SECONDS = float(os.getenv('ANALYTICS_REPORT_REFETCH_OVERLAP_SECONDS', 60))
+REPORT_FULL_REFRESH_EVERY = int(os.getenv('ANALYTICS_REPORT_FULL_REFRESH_EVERY', 10))
+_report_refreshes: Dict[int, asyncio.Task] = {}
+
+# Counter increments are aggregated in memory and written behind the request path
+analytics_buffer = AnalyticsBuffer(get_db)
+
+# Category names become map keys in the counter documents
+CATEGORY_KEY_MAX_LENGTH = 100
+
+def _category_key(category) -> str:
+    """A category name usable as a Firestore map key: non-empty, trimmed and not a reserved __name__"""
+    key = str(category or '').strip()[:CATEGORY_KEY_MAX_LENGTH]
+    if not key or (key.startswith('__') and key.endswith('__')):
+        return 'unknown'
+    return key
 
 async def update_analytics_counters(event_type: str, data: Dict = None):
-    """Update various analytics counters based on events"""
+    """Buffer analytics counter increments for an event; flushed by analytics_buffer"""
     try:
-        today = datetime.now().strftime('%Y-%m-%d')
-        analytics_ref = db.collection('analytics').document('daily')
-        
+        now = datetime.now()
+        today, hour = now.strftime('%Y-%m-%d'), now.strftime('%Y-%m-%dT%H')
+
         if event_type == "new_user":
-            analytics_ref.set({
-                today: {
-                    'newUsers': firestore.Increment(1),
-                    'totalUsers': firestore.Increment(1)
-                }
-            }, merge=True)
-        
+            analytics_buffer.add(today, {
+                'newUsers': 1,
+                'totalUsers': 1
+            }, hour)
+
         elif event_type == "search":
-            category = data.get('category', 'unknown')
-            analytics_ref.set({
-                today: {
-                    'totalSearches': firestore.Increment(1),
-                    f'searchesByCategory.{category}': firestore.Increment(1)
-                }
-            }, merge=True)
-        
+            category = _category_key((data or {}).get('category'))
+            analytics_buffer.add(today, {
+                'totalSearches': 1,
+                'searchesByCategory': {category: 1}
+            }, hour)
+            analytics_buffer.add_heatmap(search_heatmap.heatmap_buckets(now),
+                                         search_heatmap.search_fields(now, category))
+
         elif event_type == "api_call":
-            analytics_ref.set({
-                today: {
-                    'apiCalls': firestore.Increment(1)
-                }
-            }, merge=True)
+            analytics_buffer.add(today, {
+                'apiCalls': 1
+            }, hour)
+    except Exception as e:
+        raise Exception(f"Error updating analytics counters: {str(e)}")
 
-async def get_analytics_report(days: int = 7):
-    """Get detailed analytics report for specified number of days"""
+async def fetch_recent_activities(start_date: datetime, since: datetime = None, limit: int = 100) -> List[Dict]:
+    """Newest activity logs since start_date, or only those at or after since when given"""
+    query = db.collection('activityLogs').where('timestamp', '>=', since or start_date)\
+        .order_by('timestamp', direction=firestore.Query.DESCENDING)\
+        .limit(limit)
+    return [{'id': act.id, **act.to_dict()} for act in await stream_to_list(query)]
+
+def _merge_activities(new: List[Dict], previous: List[Dict], start_date: datetime, limit: int = 100) -> List[Dict]:
+    """Merge newly fetched activities into the previous ones, newest first, dropping those that left the window"""
+    cutoff = start_date.timestamp()
+    seen = {act['id'] for act in new}
+    kept = [act for act in previous
+            if act['id'] not in seen
+            and isinstance(act.get('timestamp'), datetime) and act['timestamp'].timestamp() >= cutoff]
+    merged = sorted(new + kept, reverse=True,
+                    key=lambda act: act['timestamp'].timestamp() if isinstance(act.get('timestamp'), datetime) else 0)
+    return merged[:limit]
+
+async def build_analytics_report(days: int = 7, previous: Dict = None):
+    """Compute the analytics report; with a previous report only recent activities are re-queried"""
     try:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
-        
-        # Get daily analytics
-        analytics_ref = db.collection('analytics').document('daily')
-        daily_stats = analytics_ref.get().to_dict() or {}
-        
-        # Get user statistics
+
+        previous_activities = (previous or {}).get('recentActivities') or []
+        newest = next((act['timestamp'] for act in previous_activities
+                       if isinstance(act.get('timestamp'), datetime)), None)
+        since = newest - timedelta(seconds=REPORT_REFETCH_OVERLAP_SECONDS) if newest else None
+
+        # Fetch daily analytics, users and recent activity logs concurrently; categories come from memory
         users_ref = db.collection('users')
-        total_users = len(list(users_ref.stream()))
-        
+
+        daily_stats, total_users, activities, _ = await asyncio.gather(
+            read_daily(db, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')),
+            cached_count(('users',), users_ref),
+            fetch_recent_activities(start_date, since=since),
+            categories_store.ensure_loaded()
+        )
+
         # Get category statistics
-        categories_ref = db.collection('categories')
         category_stats = {}
-        for cat in categories_ref.stream():
-            cat_data = cat.to_dict()
-            category_stats[cat.id] = {
-                'name': cat_data.get('name'),
-                'totalProviders': cat_data.get('totalProviders', 0),
-                'avgRating': cat_data.get('avgRating', 0)
+        for cat in categories_store.all():
+            category_stats[cat['id']] = {
+                'name': cat.get('name'),
+                'totalProviders': cat.get('totalProviders', 0),
+                'avgRating': cat.get('avgRating', 0)
             }
-        
+
         # Get activity logs
-        activities = db.collection('activityLogs')\
-            .where('timestamp', '>=', start_date)\
-            .order_by('timestamp', direction=firestore.Query.DESCENDING)\
-            .limit(100)\
-            .stream()
-        
-        recent_activities = [{'id': act.id, **act.to_dict()} for act in activities]
-        
+        recent_activities = _merge_activities(activities, previous_activities, start_date)
+
         return {
             'userStats': {
                 'total': total_users,
@@ -75,7 +142,7 @@ async def get_analytics_report(days: int = 7):
             },
             'searchStats': {
                 'total': sum(day.get('totalSearches', 0) for day in daily_stats.values()),
-                'byCategory': {k: sum(day.get(f'searchesByCategory.{k}', 0) for day in daily_stats.values()) 
+                'byCategory': {k: sum(day.get('searchesByCategory', {}).get(k, 0) for day in daily_stats.values())
                              for k in category_stats.keys()}
             },
             'categoryStats': category_stats,
@@ -85,34 +152,68 @@ async def get_analytics_report(days: int = 7):
             },
             'recentActivities': recent_activities
         }
+    except Exception as e:
+        raise Exception(f"Error building analytics report: {str(e)}")
+
+def _refresh_report(days: int) -> asyncio.Task:
+    """Start (or join) the single in-flight recomputation of the report for days"""
+    task = _report_refreshes.get(days)
+    if task is None:
+        async def refresh():
+            try:
+                cached = report_cache.get(days)
+                incremental = cached is not None and cached['incrementalRefreshes'] < REPORT_FULL_REFRESH_EVERY - 1
+                report = await build_analytics_report(days, previous=cached['report'] if incremental else None)
+                report_cache.set(days, {
+                    'report': report,
+                    'computedAt': time.monotonic(),
+                    'incrementalRefreshes': cached['incrementalRefreshes'] + 1 if incremental else 0
+                })
+                return report
+            finally:
+                _report_refreshes.pop(days, None)
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        _report_refreshes[days] = task
+    return task
+
+async def get_analytics_report(days: int = 7):
+    """Analytics report for the last days, served stale-while-revalidate from report_cache"""
+    cached = report_cache.get(days)
+    if cached is not None:
+        if time.monotonic() - cached['computedAt'] >= REPORT_FRESH_SECONDS:
+            _refresh_report(days)
+        return cached['report']
+    # shield: a client disconnecting must not cancel a recomputation other requests are waiting on
+    return await asyncio.shield(_refresh_report(days))
 
 async def get_category_performance(category_id: str, days: int = 30):
     """Get detailed performance metrics for a specific category"""
     try:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
-        
-        # Get category base info
-        cat_ref = db.collection('categories').document(category_id)
-        cat_data = cat_ref.get().to_dict()
-        
+
         # Get searches for this category
         searches = db.collection('activityLogs')\
             .where('type', '==', 'search')\
             .where('details.category', '==', category_id)\
-            .where('timestamp', '>=', start_date)\
-            .stream()
-        
-        search_count = len(list(searches))
-        
+            .where('timestamp', '>=', start_date)
+
         # Get saved businesses in this category
         saved = db.collection('savedBusinesses')\
             .where('businessInfo.category', '==', category_id)\
-            .where('savedAt', '>=', start_date)\
-            .stream()
-        
-        saved_count = len(list(saved))
-        
+            .where('savedAt', '>=', start_date)
+
+        # Counts are cached per day so repeated dashboard loads reuse them
+        day = end_date.strftime('%Y-%m-%d')
+        search_count, saved_count, _ = await asyncio.gather(
+            cached_count(('searches', category_id, days, day), searches),
+            cached_count(('saved', category_id, days, day), saved),
+            categories_store.ensure_loaded()
+        )
+        # Get category base info
+        cat_data = categories_store.get(category_id)
+
         return {
             'categoryInfo': cat_data,
             'metrics': {
@@ -121,20 +222,73 @@ async def get_category_performance(category_id: str, days: int = 30):
                 'conversionRate': (saved_count / search_count) if search_count > 0 else 0
             }
         }
+    except Exception as e:
+        raise Exception(f"Error fetching category performance: {str(e)}")
 
 async def cleanup_old_logs(days_to_keep: int = 90):
-    """Cleanup old activity logs to maintain database performance"""
+    """Cleanup old activity logs to maintain database performance
+
+    Progress is checkpointed in maintenanceJobs/cleanupActivityLogs after every
+    page; a run that was interrupted is resumed with its original cutoff.
+    """
     try:
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-        old_logs = db.collection('activityLogs')\
-            .where('timestamp', '<', cutoff_date)\
-            .stream()
-        
-        batch = db.batch()
-        for log in old_logs:
-            batch.delete(log.reference)
-        
-        batch.commit()
-        return {"status": "success", "message": f"Cleaned up logs older than {days_to_keep} days"}
+        checkpoint = await LOG_CLEANUP_JOB_REF.get()
+        job = checkpoint.to_dict() if checkpoint.exists else {}
+        if job.get('status') == 'running':
+            cutoff_date, cursor, previously_deleted = job['cutoff'], job.get('cursor'), job.get('deleted', 0)
+            print(f"[CLEANUP] Resuming log cleanup at {cursor} after {previously_deleted} deletes")
+        else:
+            cutoff_date, cursor, previously_deleted = datetime.now() - timedelta(days=days_to_keep), None, 0
+            await LOG_CLEANUP_JOB_REF.set({
+                'status': 'running',
+                'cutoff': cutoff_date,
+                'cursor': None,
+                'deleted': 0,
+                'startedAt': firestore.SERVER_TIMESTAMP
+            })
+
+        async def checkpoint_page(deleted: int, last_timestamp):
+            total = previously_deleted + deleted
+            await LOG_CLEANUP_JOB_REF.update({
+                'cursor': last_timestamp,
+                'deleted': total,
+                'updatedAt': firestore.SERVER_TIMESTAMP
+            })
+            print(f"[CLEANUP] Deleted {total} activity logs (through {last_timestamp})")
+
+        deleted = await delete_query_in_pages(
+            db,
+            db.collection('activityLogs').where('timestamp', '<', cutoff_date),
+            'timestamp',
+            page_size=LOG_CLEANUP_PAGE_SIZE,
+            max_concurrency=LOG_CLEANUP_CONCURRENCY,
+            max_deletes_per_second=LOG_CLEANUP_MAX_DELETES_PER_SECOND,
+            start_at=cursor,
+            on_page=checkpoint_page
+        )
+        total = previously_deleted + deleted
+        await LOG_CLEANUP_JOB_REF.update({
+            'status': 'completed',
+            'deleted': total,
+            'completedAt': firestore.SERVER_TIMESTAMP
+        })
+        return {
+            "status": "success",
+            "deleted": total,
+            "message": f"Cleaned up logs older than {cutoff_date.strftime('%Y-%m-%d')}"
+        }
     except Exception as e:
         raise Exception(f"Error cleaning up logs: {str(e)}")
+
+
+async def get_cleanup_progress():
+    """Checkpoint of the current or last log cleanup run"""
+    checkpoint = await LOG_CLEANUP_JOB_REF.get()
+    return checkpoint.to_dict() if checkpoint.exists else {"status": "never_run"}
+
+async def get_search_heatmap(range_name: str = 'week', key: str = None, category: str = None):
+    """Hour-of-week search volume for one week, month or all time; a single document read"""
+    try:
+        return await search_heatmap.read_heatmap(db, search_heatmap.bucket_id(range_name, key), category)
+    except Exception as e:
+        raise Exception(f"Error reading search heatmap: {str(e)}")
@@ -0,0 +1,176 @@
+"""Write-behind aggregation of analytics counter increments
+
+Events are merged in memory per day (and per category inside each day) and
+flushed as one sharded increment per day on a timer or once enough events
+have piled up, so counters cost no Firestore write on the request path.
+
+Loss is bounded: a crash loses at most one flush interval or
+ANALYTICS_FLUSH_MAX_EVENTS events, whichever comes first. If Firestore
+rejects a flush the increments are merged back and retried, up to
+ANALYTICS_MAX_PENDING_EVENTS; anything beyond that is dropped and counted.
+Writes the client rejects as invalid (ValueError, TypeError, InvalidArgument)
+would fail the same way every time, so they are dropped rather than retried.
+
+With ANALYTICS_HOURLY_ROLLUPS enabled the same increments are also merged per
+hour and written to the hour rollup buckets on each flush. Search heatmap
+cells are merged and flushed the same way, once per heatmap document.
+"""
+import asyncio
+import os
+from google.api_core.exceptions import InvalidArgument
+from utils import analytics_rollups, search_heatmap
+from utils.sharded_counters import increment_daily, sum_into
+
+
+_BUCKET_WRITERS = {
+    'hour': analytics_rollups.increment_hourly,
+    'heatmap': search_heatmap.increment_heatmap,
+}
+
+# Errors that retrying the same write cannot fix
+_PERMANENT_ERRORS = (ValueError, TypeError, InvalidArgument)
+
+
+class AnalyticsBuffer:
+    def __init__(self, db_getter):
+        self._get_db = db_getter
+        self.flush_interval = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', 5))
+        self.flush_max_events = int(os.getenv('ANALYTICS_FLUSH_MAX_EVENTS', 500))
+        self.max_pending_events = int(os.getenv('ANALYTICS_MAX_PENDING_EVENTS', 50000))
+        self._pending = {}
+        # (kind, key) -> {'fields', 'events'} for documents other than the daily shards, see _BUCKET_WRITERS
+        self._pending_buckets = {}
+        self._pending_events = 0
+        # Events behind the pending buckets, capped at max_pending_events like the days
+        self._pending_bucket_events = 0
+        self._task = None
+        # Early flush started by add() once enough events are buffered; kept so stop() can await it
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._metrics = {'eventsBuffered': 0, 'eventsFlushed': 0, 'eventsDropped': 0, 'bucketEventsDropped': 0,
+                         'writesIssued': 0, 'flushes': 0, 'flushErrors': 0}
+
+    def add(self, day: str, fields: dict, hour: str = None):
+        """Record an increment; never touches Firestore directly."""
+        if self._pending_events >= self.max_pending_events:
+            self._metrics['eventsDropped'] += 1
+            return
+        self._requeue(day, fields, 1)
+        if hour and analytics_rollups.HOURLY_ROLLUPS:
+            self._requeue_bucket(('hour', hour), fields, 1)
+        self._metrics['eventsBuffered'] += 1
+        if (self._pending_events >= self.flush_max_events and not self._flush_lock.locked()
+                and (self._flush_task is None or self._flush_task.done())):
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass  # no loop (e.g. a script); the next explicit flush picks it up
+
+    def add_heatmap(self, buckets: list, fields: dict):
+        """Record search heatmap cells for each of the heatmap documents in buckets."""
+        for bucket in buckets:
+            self._requeue_bucket(('heatmap', bucket), fields, 1)
+
+    def _requeue(self, day: str, fields: dict, events: int):
+        entry = self._pending.setdefault(day, {'fields': {}, 'events': 0})
+        sum_into(entry['fields'], fields)
+        entry['events'] += events
+        self._pending_events += events
+
+    def _requeue_bucket(self, bucket: tuple, fields: dict, events: int) -> bool:
+        """Merge fields into a pending bucket; drops them (and returns False) once the buckets are full."""
+        if self._pending_bucket_events + events > self.max_pending_events:
+            self._metrics['bucketEventsDropped'] += events
+            return False
+        entry = self._pending_buckets.setdefault(bucket, {'fields': {}, 'events': 0})
+        sum_into(entry['fields'], fields)
+        entry['events'] += events
+        self._pending_bucket_events += events
+        return True
+
+    async def flush(self):
+        """Write everything buffered so far as one aggregated increment per day."""
+        async with self._flush_lock:
+            if not self._pending and not self._pending_buckets:
+                return
+            pending, buckets = self._pending, self._pending_buckets
+            self._pending, self._pending_buckets, self._pending_events = {}, {}, 0
+            self._pending_bucket_events = 0
+
+            db = self._get_db()
+            if buckets:
+                await self._flush_buckets(db, buckets)
+            results = await asyncio.gather(
+                *(increment_daily(db, day, entry['fields']) for day, entry in pending.items()),
+                return_exceptions=True
+            )
+            self._metrics['flushes'] += 1
+
+            for (day, entry), result in zip(pending.items(), results):
+                if not isinstance(result, Exception):
+                    self._metrics['writesIssued'] += 1
+                    self._metrics['eventsFlushed'] += entry['events']
+                    continue
+                self._metrics['flushErrors'] += 1
+                if isinstance(result, _PERMANENT_ERRORS):
+                    print(f"[ANALYTICS] Dropping {entry['events']} events for {day}, write rejected: {result}")
+                    self._metrics['eventsDropped'] += entry['events']
+                elif self._pending_events + entry['events'] > self.max_pending_events:
+                    print(f"[ANALYTICS] Dropping {entry['events']} events for {day} after failed flush: {result}")
+                    self._metrics['eventsDropped'] += entry['events']
+                else:
+                    print(f"[ANALYTICS] Flush failed for {day}, re-queueing {entry['events']} events: {result}")
+                    self._requeue(day, entry['fields'], entry['events'])
+
+    async def _flush_buckets(self, db, buckets: dict):
+        results = await asyncio.gather(
+            *(_BUCKET_WRITERS[kind](db, key, entry['fields']) for (kind, key), entry in buckets.items()),
+            return_exceptions=True
+        )
+        for ((kind, key), entry), result in zip(buckets.items(), results):
+            if not isinstance(result, Exception):
+                self._metrics['writesIssued'] += 1
+                continue
+            # These are secondary views of the day totals; retry them alongside the next flush
+            self._metrics['flushErrors'] += 1
+            if isinstance(result, _PERMANENT_ERRORS):
+                print(f"[ANALYTICS] Dropping {kind} {key}, write rejected: {result}")
+                self._metrics['bucketEventsDropped'] += entry['events']
+            elif self._requeue_bucket((kind, key), entry['fields'], entry['events']):
+                print(f"[ANALYTICS] Flush failed for {kind} {key}, re-queueing: {result}")
+            else:
+                print(f"[ANALYTICS] Dropping {kind} {key} after failed flush, buckets are full: {result}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[ANALYTICS] Periodic flush error: {str(e)}")
+
+    def start(self):
+        """Start the periodic flusher on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flusher and write out whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_task is not None:
+            try:
+                await self._flush_task
+            except Exception as e:
+                print(f"[ANALYTICS] Early flush error: {str(e)}")
+            self._flush_task = None
+        await self.flush()
+
+    def get_metrics(self) -> dict:
+        return {**self._metrics, 'pendingEvents': self._pending_events, 'pendingDays': len(self._pending),
+                'pendingBuckets': len(self._pending_buckets), 'pendingBucketEvents': self._pending_bucket_events}
@@ -0,0 +1,199 @@
+"""Time-bucketed analytics rollups
+
+Counters move through these stages:
+
+    analyticsDailyShards/{date}_{n}     live sharded counters for recent days
+    analyticsRollups/day_{date}         one document per day once it's settled
+    analyticsRollups/week_{YYYY-Www}    old days folded into ISO weeks
+    analyticsRollups/month_{YYYY-MM}    ...and into calendar months
+    analyticsRollups/hour_{date}T{HH}   optional per-hour buckets (ANALYTICS_HOURLY_ROLLUPS)
+
+Range reads only touch the buckets inside the requested range, and
+compact_analytics() moves data down the stages. Every fold is committed in
+the same atomic batch as the deletion of its source documents, so re-running
+an interrupted compaction never double counts.
+"""
+import asyncio
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict
+from firebase_admin import firestore
+from utils.firestore_batches import FIRESTORE_BATCH_LIMIT, chunked, commit_batches
+from utils.sharded_counters import SHARD_COLLECTION, increment_fields, read_daily_shards, sum_into
+
+ROLLUP_COLLECTION = 'analyticsRollups'
+HOURLY_ROLLUPS = os.getenv('ANALYTICS_HOURLY_ROLLUPS', 'false').strip().lower() in ('1', 'true', 'yes')
+SHARD_COMPACT_AFTER_DAYS = int(os.getenv('ANALYTICS_SHARD_COMPACT_AFTER_DAYS', 2))
+DAILY_RETENTION_DAYS = int(os.getenv('ANALYTICS_DAILY_RETENTION_DAYS', 120))
+HOURLY_RETENTION_DAYS = int(os.getenv('ANALYTICS_HOURLY_RETENTION_DAYS', 7))
+
+ROLLUP_META_FIELDS = ('period', 'key', 'start')
+LEGACY_DATE_FIELD = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def week_key(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def month_key(day: date) -> str:
+    return day.strftime('%Y-%m')
+
+
+def rollup_ref(db, period: str, key: str):
+    return db.collection(ROLLUP_COLLECTION).document(f'{period}_{key}')
+
+
+def rollup_increment(period: str, key: str, start: str, fields: dict) -> dict:
+    """Merge-set payload adding fields to a rollup bucket."""
+    return {'period': period, 'key': key, 'start': start, **increment_fields(fields)}
+
+
+async def increment_hourly(db, hour: str, fields: dict):
+    """Add fields to an hour bucket (hour is 'YYYY-MM-DDTHH')."""
+    await rollup_ref(db, 'hour', hour).set(rollup_increment('hour', hour, hour[:10], fields), merge=True)
+
+
+def _counters(data: dict) -> dict:
+    return {k: v for k, v in data.items() if k not in ROLLUP_META_FIELDS}
+
+
+async def read_rollups(db, period: str, start_day: str, end_day: str) -> Dict[str, dict]:
+    """Counters per bucket key for one period whose start falls in start_day..end_day."""
+    query = (db.collection(ROLLUP_COLLECTION)
+             .where('period', '==', period)
+             .where('start', '>=', start_day)
+             .where('start', '<=', end_day))
+    return {doc.get('key'): _counters(doc.to_dict()) async for doc in query.stream()}
+
+
+async def read_daily(db, start_day: str, end_day: str) -> Dict[str, dict]:
+    """Counters for start_day..end_day, from live shards, day rollups and week rollups.
+
+    Days are keyed by date. Days older than the daily retention have been
+    folded into weeks and are only available as whole weeks, keyed by week
+    (e.g. '2025-W07'), so a range reaching that far back is widened to the
+    weeks it overlaps. Every count lives in exactly one of a shard, a day or
+    a week bucket, so nothing is counted twice.
+    """
+    first_monday = date.fromisoformat(start_day)
+    first_monday = (first_monday - timedelta(days=first_monday.weekday())).isoformat()
+    shards, days, weeks = await asyncio.gather(
+        read_daily_shards(db, start_day, end_day),
+        read_rollups(db, 'day', start_day, end_day),
+        read_rollups(db, 'week', first_monday, end_day)
+    )
+    for bucket in (shards, weeks):
+        for key, counters in bucket.items():
+            sum_into(days.setdefault(key, {}), counters)
+    return days
+
+
+async def compact_shards(db, before_day: str) -> int:
+    """Fold each day's shards older than before_day into its day rollup."""
+    by_day = {}
+    query = db.collection(SHARD_COLLECTION).where('date', '<', before_day)
+    async for doc in query.stream():
+        by_day.setdefault(doc.get('date'), []).append(doc)
+
+    for day, docs in by_day.items():
+        # The rollup write and every shard delete go in one batch, so a day is folded exactly once
+        if len(docs) >= FIRESTORE_BATCH_LIMIT:
+            raise ValueError(f"{day} has {len(docs)} shards, too many for one batch")
+        totals = {}
+        for doc in docs:
+            data = doc.to_dict()
+            data.pop('date', None)
+            data.pop('shard', None)
+            sum_into(totals, data)
+        batch = db.batch()
+        batch.set(rollup_ref(db, 'day', day), rollup_increment('day', day, day, totals), merge=True)
+        for doc in docs:
+            batch.delete(doc.reference)
+        await batch.commit()
+    return len(by_day)
+
+
+async def fold_days(db, before_day: str) -> int:
+    """Fold day rollups older than before_day into week and month rollups."""
+    query = (db.collection(ROLLUP_COLLECTION)
+             .where('period', '==', 'day')
+             .where('start', '<', before_day))
+    folded = 0
+    async for doc in query.stream():
+        day = datetime.strptime(doc.get('start'), '%Y-%m-%d').date()
+        counters = _counters(doc.to_dict())
+        week_start = (day - timedelta(days=day.weekday())).isoformat()
+        month_start = day.replace(day=1).isoformat()
+
+        batch = db.batch()
+        batch.set(rollup_ref(db, 'week', week_key(day)),
+                  rollup_increment('week', week_key(day), week_start, counters), merge=True)
+        batch.set(rollup_ref(db, 'month', month_key(day)),
+                  rollup_increment('month', month_key(day), month_start, counters), merge=True)
+        batch.delete(doc.reference)
+        await batch.commit()
+        folded += 1
+    return folded
+
+
+async def prune_hourly(db, before_day: str) -> int:
+    """Delete hour buckets older than before_day; their days already hold the totals."""
+    query = (db.collection(ROLLUP_COLLECTION)
+             .where('period', '==', 'hour')
+             .where('start', '<', before_day))
+    refs = [doc.reference async for doc in query.select([]).stream()]
+    await commit_batches(db, [lambda batch, ref=ref: batch.delete(ref) for ref in refs])
+    return len(refs)
+
+
+async def migrate_legacy_daily(db) -> int:
+    """Move the date-keyed maps of the old analytics/daily document into day rollups.
+
+    Migrated dates are recorded on the legacy document in the same batch, so
+    the migration can be re-run safely.
+    """
+    legacy_ref = db.collection('analytics').document('daily')
+    legacy = await legacy_ref.get()
+    if not legacy.exists:
+        return 0
+    data = legacy.to_dict()
+    done = set(data.get('migratedDates') or [])
+
+    days = []
+    for day, stats in data.items():
+        if not LEGACY_DATE_FIELD.match(day) or not isinstance(stats, dict) or day in done:
+            continue
+        counters = {}
+        for field, value in stats.items():
+            # Older writes stored per-category counts as literal 'searchesByCategory.<name>' keys
+            if field.startswith('searchesByCategory.'):
+                counters.setdefault('searchesByCategory', {})[field.split('.', 1)[1]] = value
+            elif isinstance(value, (int, float, dict)):
+                counters[field] = value
+        days.append((day, counters))
+
+    for chunk in chunked(days, FIRESTORE_BATCH_LIMIT - 1):
+        batch = db.batch()
+        for day, counters in chunk:
+            batch.set(rollup_ref(db, 'day', day), rollup_increment('day', day, day, counters), merge=True)
+        batch.update(legacy_ref, {'migratedDates': firestore.ArrayUnion([day for day, _ in chunk])})
+        await batch.commit()
+    return len(days)
+
+
+async def compact_analytics(db, migrate_legacy: bool = False) -> dict:
+    """Run every compaction stage; safe to schedule daily."""
+    today = datetime.now().date()
+    stats = {}
+    if migrate_legacy:
+        stats['legacyDaysMigrated'] = await migrate_legacy_daily(db)
+    stats['daysCompacted'] = await compact_shards(
+        db, (today - timedelta(days=SHARD_COMPACT_AFTER_DAYS)).isoformat())
+    stats['daysFolded'] = await fold_days(
+        db, (today - timedelta(days=DAILY_RETENTION_DAYS)).isoformat())
+    stats['hoursPruned'] = await prune_hourly(
+        db, (today - timedelta(days=HOURLY_RETENTION_DAYS)).isoformat())
+    print(f"[ANALYTICS] Compaction finished: {stats}")
+    return stats
@@ -0,0 +1,19 @@
+"""Deterministic document ids for saved businesses"""
+import hashlib
+import re
+
+
+def normalize_key_part(value: str) -> str:
+    """Lowercase and collapse whitespace, matching the old case-insensitive comparison."""
+    return re.sub(r'\s+', ' ', str(value or '')).strip().lower()
+
+
+def saved_business_id(user_id: str, name: str, address: str) -> str:
+    """Document id for a user's saved business.
+
+    The same (userId, name, address) always maps to the same id, so checking
+    whether a business is saved is a single document get instead of a scan
+    of the user's whole saved list.
+    """
+    raw = '\x1f'.join([str(user_id), normalize_key_part(name), normalize_key_part(address)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
@@ -0,0 +1,92 @@
+"""Denormalized per-user saved-business counts by category
+
+Counts live in savedBusinessCounts/{userId} as
+    {'total': n, 'byCategory': {category: n}, 'updatedAt': ...}
+and are adjusted in the same atomic write as the save, unsave or
+recategorize that changes them. reconcile_user_counts rebuilds a summary
+from the savedBusinesses collection to repair any drift, inside a transaction
+so increments committed while it recounts are not overwritten.
+"""
+from collections import Counter
+from typing import Dict
+from firebase_admin import firestore, firestore_async
+
+COUNTS_COLLECTION = 'savedBusinessCounts'
+UNCATEGORIZED = 'uncategorized'
+
+
+def counts_ref(db, user_id: str):
+    return db.collection(COUNTS_COLLECTION).document(user_id)
+
+
+def category_of(business_info: dict) -> str:
+    return (business_info or {}).get('category') or UNCATEGORIZED
+
+
+def count_deltas(deltas: Dict[str, int]) -> dict:
+    """Merge-set payload applying per-category deltas; zero deltas are skipped."""
+    deltas = {category: delta for category, delta in deltas.items() if delta}
+    return {
+        'total': firestore.Increment(sum(deltas.values())),
+        'byCategory': {category: firestore.Increment(delta) for category, delta in deltas.items()},
+        'updatedAt': firestore.SERVER_TIMESTAMP
+    }
+
+
+def _summary(doc) -> dict:
+    data = doc.to_dict() if doc.exists else {}
+    by_category = {k: v for k, v in (data.get('byCategory') or {}).items() if v > 0}
+    return {
+        'total': max(data.get('total', 0), 0),
+        'byCategory': by_category,
+        'updatedAt': data.get('updatedAt')
+    }
+
+
+async def read_counts(db, user_id: str) -> dict:
+    """Current summary for a user, dropping categories that have reached zero."""
+    return _summary(await counts_ref(db, user_id).get())
+
+
+@firestore_async.async_transactional
+async def _reconcile_in_transaction(transaction, db, user_id: str):
+    # Both reads are part of the transaction, so a save or unsave that commits in between
+    # makes it retry instead of being overwritten by the recount
+    docs = (db.collection('savedBusinesses')
+            .where('userId', '==', user_id)
+            .select(['businessInfo.category'])
+            .stream(transaction=transaction))
+    actual = Counter([category_of((doc.to_dict() or {}).get('businessInfo')) async for doc in docs])
+    current = _summary(await counts_ref(db, user_id).get(transaction=transaction))
+
+    drifted = current['total'] != sum(actual.values()) or current['byCategory'] != dict(actual)
+    if drifted:
+        transaction.set(counts_ref(db, user_id), {
+            'total': sum(actual.values()),
+            'byCategory': dict(actual),
+            'updatedAt': firestore.SERVER_TIMESTAMP
+        })
+    return current, actual, drifted
+
+
+async def reconcile_user_counts(db, user_id: str) -> dict:
+    """Recount a user's saved businesses and overwrite the summary if it drifted."""
+    current, actual, drifted = await _reconcile_in_transaction(db.transaction(), db, user_id)
+    if drifted:
+        print(f"[COUNTS] Repaired drift for user {user_id}: {current['byCategory']} -> {dict(actual)}")
+    return {'userId': user_id, 'repaired': drifted, 'byCategory': dict(actual)}
+
+
+async def reconcile_all_counts(db) -> dict:
+    """Reconcile every user that has saved businesses or a counts summary."""
+    user_ids = {doc.id async for doc in db.collection(COUNTS_COLLECTION).select([]).stream()}
+    async for doc in db.collection('savedBusinesses').select(['userId']).stream():
+        user_id = (doc.to_dict() or {}).get('userId')
+        if user_id:
+            user_ids.add(user_id)
+
+    repaired = 0
+    for user_id in sorted(user_ids):
+        if (await reconcile_user_counts(db, user_id))['repaired']:
+            repaired += 1
+    return {'users': len(user_ids), 'repaired': repaired}
@@ -0,0 +1,133 @@
+"""Near-duplicate detection for provider results
+
+Every provider is reduced to a handful of hash keys (phone, normalized full
+name, address fingerprint + leading name token). Two providers are
+duplicates when they share any key, so a whole result set is de-duplicated
+with set lookups instead of pairwise comparisons. Names on their own only
+match when they are the same words: the stopword-stripped, stemmed form is
+too loose to identify a business ("Sharma Services" vs "Sharma Enterprises")
+and is only used together with the address.
+"""
+import re
+from typing import Iterable, List, Optional
+
+PLACEHOLDER_PHONE = 'XXXXX-XXXXX'
+PLACEHOLDER_ADDRESS = 'address not provided'
+
+# Words that don't tell two businesses apart ("Sharma Electrical Works" == "Sharma Electricals")
+NAME_STOPWORDS = {
+    'the', 'and', 'of', 'a', 'an', 'works', 'work', 'service', 'services', 'shop', 'store',
+    'company', 'co', 'corp', 'enterprise', 'enterprises', 'pvt', 'private', 'ltd', 'limited',
+    'llc', 'inc', 'agency', 'centre', 'center', 'solution', 'solutions'
+}
+
+ADDRESS_STOPWORDS = {'the', 'and', 'of', 'near', 'opp', 'opposite', 'behind', 'india', 'no'}
+
+ADDRESS_ABBREVIATIONS = {
+    'road': 'rd', 'street': 'st', 'avenue': 'ave', 'sector': 'sec', 'nagar': 'ngr',
+    'block': 'blk', 'floor': 'flr', 'building': 'bldg', 'apartment': 'apt', 'main': 'mn',
+    'colony': 'col', 'market': 'mkt', 'phase': 'ph'
+}
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r'[a-z0-9]+', str(text or '').lower())
+
+
+def _stem(token: str) -> str:
+    """Very small plural stripper so 'electricals' and 'electrical' collide."""
+    if token.isdigit() or len(token) <= 3:
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def phone_key(phone: str) -> Optional[str]:
+    """Last 10 digits of a phone number, or None for missing/placeholder numbers."""
+    if not phone or phone == PLACEHOLDER_PHONE:
+        return None
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) < 7:
+        return None
+    return digits[-10:]
+
+
+def _name_tokens(name: str) -> List[str]:
+    tokens = [_stem(t) for t in _tokens(name)]
+    significant = [t for t in tokens if t not in NAME_STOPWORDS]
+    # A name made only of stopwords ("The Service Co") still needs a key
+    return significant or tokens
+
+
+def name_key(name: str) -> Optional[str]:
+    """A business name's words, lowercased and without punctuation, stopwords kept."""
+    return ' '.join(_tokens(name)) or None
+
+
+def name_head(name: str) -> Optional[str]:
+    """First significant name token, usually the proprietor or brand ('sharma')."""
+    tokens = _name_tokens(name)
+    return tokens[0] if tokens else None
+
+
+def address_key(address: str) -> Optional[str]:
+    """Fingerprint of an address that ignores punctuation, order and common abbreviations."""
+    if not address or str(address).strip().lower() == PLACEHOLDER_ADDRESS:
+        return None
+    tokens = set()
+    for token in _tokens(address):
+        token = ADDRESS_ABBREVIATIONS.get(token, token)
+        if token not in ADDRESS_STOPWORDS:
+            tokens.add(_stem(token))
+    return ' '.join(sorted(tokens)) or None
+
+
+class ProviderDeduplicator:
+    """Tracks the blocking keys of every provider accepted so far."""
+
+    def __init__(self, existing: Iterable[str] = None):
+        self._seen = set()
+        for entry in existing or []:
+            self.add_existing(entry)
+
+    def add_existing(self, entry: str):
+        """Register a provider the client already has (name or phone string)."""
+        phone = phone_key(entry)
+        if phone and not re.search(r'[a-zA-Z]', entry):
+            self._seen.add(('phone', phone))
+            return
+        name = name_key(entry)
+        if name:
+            self._seen.add(('name', name))
+
+    @staticmethod
+    def _keys(provider: dict) -> List[tuple]:
+        keys = []
+        phone = phone_key(provider.get('phone'))
+        name = name_key(provider.get('name'))
+        head = name_head(provider.get('name'))
+        address = address_key(provider.get('address'))
+        if phone:
+            keys.append(('phone', phone))
+        if name:
+            keys.append(('name', name))
+        if head and address:
+            keys.append(('addr', address, head))
+        return keys
+
+    def add(self, provider: dict) -> bool:
+        """Record provider; returns False if it duplicates one already seen."""
+        keys = self._keys(provider)
+        if any(key in self._seen for key in keys):
+            return False
+        self._seen.update(keys)
+        return True
+
+
+def dedupe_providers(providers: Iterable[dict], existing: Iterable[str] = None) -> List[dict]:
+    """Drop near-duplicate providers, keeping the first occurrence, in O(n)."""
+    deduper = ProviderDeduplicator(existing)
+    return [p for p in providers if deduper.add(p)]
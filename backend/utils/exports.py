@@ -0,0 +1,109 @@
+"""Streaming CSV / NDJSON exports of Firestore collections
+
+Documents are read one cursor page at a time and encoded row by row, so an
+export holds at most one page of snapshots and one output chunk in memory
+however large the collection is.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+EXPORT_PAGE_SIZE = 1000
+# Encoded rows are gathered into chunks of about this size before being yielded
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# collection -> (order field, CSV columns); nested fields use dotted paths
+EXPORT_COLLECTIONS = {
+    'activityLogs': ('timestamp', ['id', 'timestamp', 'type', 'message', 'userId', 'userEmail', 'details']),
+    'searchQueries': ('timestamp', ['id', 'timestamp', 'userId', 'category', 'location']),
+    'savedBusinesses': ('savedAt', ['id', 'savedAt', 'userId', 'businessInfo.name', 'businessInfo.category',
+                                    'businessInfo.phone', 'businessInfo.address', 'businessInfo.website',
+                                    'businessInfo.rating', 'businessInfo.reviews', 'businessInfo.confidence']),
+}
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _field(data: dict, path: str):
+    for part in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    return str(value)
+
+
+async def iter_documents(query, order_field: str, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator:
+    """Yield every document of query in order_field order, one page of snapshots at a time."""
+    query = query.order_by(order_field).limit(page_size)
+    last = None
+    while True:
+        page = query.start_after(last) if last is not None else query
+        count = 0
+        async for doc in page.stream():
+            count += 1
+            last = doc
+            yield doc
+        if count < page_size:
+            return
+
+
+async def encode_rows(docs: AsyncIterator, fmt: str, columns: List[str]) -> AsyncIterator[bytes]:
+    """Encode documents as CSV (with a header row) or NDJSON, in chunks of about EXPORT_CHUNK_BYTES."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(columns)
+
+    async for doc in docs:
+        data = doc.to_dict() or {}
+        if fmt == 'csv':
+            writer.writerow([doc.id if column == 'id' else _csv_value(_field(data, column)) for column in columns])
+        else:
+            buffer.write(json.dumps({'id': doc.id, **data}, default=_json_default))
+            buffer.write('\n')
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a byte stream incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(query, collection: str, fmt: str, gzip: bool = False,
+                  columns: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+    """Byte stream of a collection export, ready for a StreamingResponse."""
+    order_field, default_columns = EXPORT_COLLECTIONS[collection]
+    stream = encode_rows(iter_documents(query, order_field), fmt, columns or default_columns)
+    return gzip_chunks(stream) if gzip else stream
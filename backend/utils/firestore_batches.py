@@ -0,0 +1,86 @@
+"""Helpers for splitting Firestore writes into limit-sized batches"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+# Firestore rejects a WriteBatch with more than 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def chunked(items: list, size: int = FIRESTORE_BATCH_LIMIT) -> Iterable[list]:
+    """Yield consecutive slices of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def commit_batches(db, operations: List[Callable], chunk_size: int = FIRESTORE_BATCH_LIMIT,
+                         max_concurrency: int = 4) -> List[Optional[Exception]]:
+    """Apply operations in chunked WriteBatches committed concurrently.
+
+    Each operation is a callable that adds exactly one write to the batch it
+    is given. Returns one entry per operation: None if its batch committed,
+    or the exception that failed its batch.
+    """
+    results: List[Optional[Exception]] = [None] * len(operations)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def commit_chunk(offset: int, chunk: list):
+        batch = db.batch()
+        for op in chunk:
+            op(batch)
+        async with semaphore:
+            try:
+                await batch.commit()
+            except Exception as e:
+                print(f"[BATCH] Commit of {len(chunk)} writes at offset {offset} failed: {str(e)}")
+                for i in range(offset, offset + len(chunk)):
+                    results[i] = e
+
+    await asyncio.gather(*(
+        commit_chunk(offset, chunk)
+        for offset, chunk in zip(range(0, len(operations), chunk_size), chunked(operations, chunk_size))
+    ))
+    return results
+
+
+async def delete_query_in_pages(db, query, order_field: str, page_size: int = 1000,
+                                max_concurrency: int = 4, max_deletes_per_second: float = 0,
+                                start_at=None,
+                                on_page: Callable[[int, object], Awaitable[None]] = None) -> int:
+    """Delete every document matching query, one ordered page at a time.
+
+    Only one page of document references is held in memory. Each page is
+    committed in limit-sized batches (at most max_concurrency in flight) and
+    the next page starts at the last order_field value seen, so the scan never
+    revisits deleted documents. on_page(deleted_so_far, last_value) is awaited
+    after every page, which lets callers checkpoint and later resume through
+    start_at. max_deletes_per_second (0 = unlimited) paces the deletes so a
+    large cleanup does not starve live traffic. Stops at the first page with a
+    failed batch and raises its error.
+    """
+    query = query.order_by(order_field).select([order_field]).limit(page_size)
+    deleted = 0
+    started = time.monotonic()
+    cursor = start_at
+    while True:
+        page_query = query.start_at({order_field: cursor}) if cursor is not None else query
+        docs = [doc async for doc in page_query.stream()]
+        if not docs:
+            return deleted
+
+        results = await commit_batches(db, [lambda batch, ref=doc.reference: batch.delete(ref) for doc in docs],
+                                       max_concurrency=max_concurrency)
+        errors = [e for e in results if e is not None]
+        deleted += len(docs) - len(errors)
+        if errors:
+            raise errors[0]
+
+        # start_at is inclusive: deleted documents with the last value are gone and any left on the
+        # page boundary are picked up by the next page
+        cursor = docs[-1].get(order_field)
+        if on_page:
+            await on_page(deleted, cursor)
+        if len(docs) < page_size:
+            return deleted
+        if max_deletes_per_second > 0:
+            await asyncio.sleep(max(0.0, deleted / max_deletes_per_second - (time.monotonic() - started)))
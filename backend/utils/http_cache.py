@@ -0,0 +1,71 @@
+"""ETag / conditional GET helpers"""
+import hashlib
+import json
+from typing import Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+
+def encode_json(payload) -> bytes:
+    """Serialize a response payload once, Firestore timestamps included."""
+    return json.dumps(jsonable_encoder(payload), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a serialized body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def version_etag(version: str) -> str:
+    """Strong ETag that is a resource's version itself (e.g. a document update time).
+
+    Lets a handler answer 304 before serializing anything, and lets clients
+    send the same value back in If-Match.
+    """
+    return '"' + version + '"'
+
+
+def if_match_version(header: Optional[str]) -> Optional[str]:
+    """The version named by an If-Match header built from version_etag.
+
+    None when there is no precondition (no header, or '*'). The W/ prefix
+    the compression middleware adds is accepted, since the version still
+    names the stored resource. Raises ValueError for malformed tags, which
+    can never match.
+    """
+    if header is None or header.strip() == '*':
+        return None
+    tag = header.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    if ',' in tag or len(tag) < 3 or not (tag.startswith('"') and tag.endswith('"')):
+        raise ValueError(f"If-Match must be a single strong ETag, got {header!r}")
+    return tag[1:-1]
+
+
+def not_modified(etag: str, cache_control: Optional[str] = 'private, no-cache') -> Response:
+    headers = {'ETag': etag}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    return Response(status_code=304, headers=headers)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names this ETag, or its weak (compressed) form."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def conditional_response(request: Request, body: bytes, etag: str,
+                         cache_control: Optional[str] = 'private, no-cache') -> Response:
+    """304 if the client's copy is current, otherwise the pre-serialized JSON body."""
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    headers = {'ETag': etag}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    return Response(content=body, media_type='application/json', headers=headers)
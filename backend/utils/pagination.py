@@ -0,0 +1,61 @@
+"""Cursor pagination and field projection for Firestore list queries"""
+import base64
+import binascii
+import json
+from typing import List, Optional, Tuple
+from firebase_admin import firestore
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Turn a comma separated ?fields= value into field paths (None means all fields)."""
+    if not fields:
+        return None
+    paths = [f.strip() for f in fields.split(',') if f.strip()]
+    return paths or None
+
+
+def encode_cursor(doc, order_field: str) -> str:
+    """Opaque cursor holding the last document's sort value and id."""
+    value = doc.get(order_field)
+    raw = json.dumps({'v': value.rfc3339() if hasattr(value, 'rfc3339') else value.isoformat(), 'id': doc.id})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[DatetimeWithNanoseconds, str]:
+    """(sort value, document id) from a cursor made by encode_cursor; ValueError if malformed."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return DatetimeWithNanoseconds.from_rfc3339(raw['v']), str(raw['id'])
+    except (binascii.Error, UnicodeDecodeError, TypeError, KeyError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+async def paginate_query(collection_ref, query, limit: int = DEFAULT_PAGE_SIZE, start_after: Optional[str] = None,
+                         fields: Optional[List[str]] = None, order_field: str = 'savedAt') -> Tuple[list, Optional[str]]:
+    """Run one page of query ordered newest first.
+
+    start_after is the nextCursor of the previous page. It carries the last
+    item's sort value and id rather than pointing at the document, so it
+    stays valid when that document is deleted and is always resolved within
+    query. Returns the page's snapshots and the cursor for the next page,
+    which is None once the last page has been reached.
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    # Document id breaks ties between equal timestamps, so no item is skipped or repeated
+    query = (query.order_by(order_field, direction=firestore.Query.DESCENDING)
+             .order_by('__name__', direction=firestore.Query.DESCENDING))
+
+    if fields:
+        query = query.select(fields if order_field in fields else [*fields, order_field])
+
+    if start_after:
+        value, doc_id = decode_cursor(start_after)
+        query = query.start_after([value, collection_ref.document(doc_id)])
+
+    docs = [doc async for doc in query.limit(limit).stream()]
+    next_cursor = encode_cursor(docs[-1], order_field) if len(docs) == limit else None
+    return docs, next_cursor
@@ -0,0 +1,28 @@
+"""Per-user cache of saved-business pages
+
+Read-through cache of saved-business pages, tagged by user so any write drops
+that user's pages. Every path that writes savedBusinesses (the business
+routes and FirebaseService) calls invalidate_saved_cache after committing.
+The TTL bounds staleness from writes made by other processes or directly from
+the frontend.
+"""
+import itertools
+import os
+from utils.cache import LRUCache
+
+saved_businesses_cache = LRUCache(
+    max_entries=int(os.getenv('SAVED_BUSINESSES_CACHE_MAX_ENTRIES', 2000)),
+    ttl_seconds=float(os.getenv('SAVED_BUSINESSES_CACHE_TTL', 300))
+)
+# Cache generation per user, changed by every invalidation. A page read that started before a write
+# sees a different generation when it finishes and is not cached, so it cannot outlive the invalidation.
+saved_cache_generations = LRUCache(max_entries=int(os.getenv('SAVED_BUSINESSES_CACHE_MAX_ENTRIES', 2000)) * 5)
+_next_generation = itertools.count(1)
+
+
+def invalidate_saved_cache(user_id: str):
+    """Drop every cached saved-business page for a user after a write."""
+    saved_cache_generations.set(user_id, next(_next_generation))
+    dropped = saved_businesses_cache.invalidate_tag(user_id)
+    if dropped:
+        print(f"[CACHE] Invalidated {dropped} saved-business pages for user {user_id}")
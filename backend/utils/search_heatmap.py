@@ -0,0 +1,77 @@
+"""Precomputed hour-of-week search heatmaps
+
+Each search adds one to a cell "<weekday>_<hour>" (Monday = 0) of the
+heatmap documents for its ISO week, its month and all time
+(searchHeatmaps/week_2025-W07, month_2025-02, all), both overall and per
+category. The cells are map fields rather than an array because Firestore can
+only increment fields. A heatmap for any of those ranges is one document read,
+expanded to a 7x24 matrix.
+"""
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+from utils.analytics_rollups import month_key, week_key
+from utils.sharded_counters import increment_fields
+
+HEATMAP_COLLECTION = 'searchHeatmaps'
+HEATMAP_RANGES = ('week', 'month', 'all')
+# Key format per range; 'all' is a single document and takes no key
+HEATMAP_KEY_PATTERNS = {'week': re.compile(r'\d{4}-W\d{2}'), 'month': re.compile(r'\d{4}-\d{2}')}
+
+
+def cell_key(moment: datetime) -> str:
+    return f'{moment.weekday()}_{moment.hour:02d}'
+
+
+def heatmap_buckets(moment: datetime) -> List[str]:
+    """Document ids of every heatmap a search at moment counts towards."""
+    day = moment.date()
+    return [f'week_{week_key(day)}', f'month_{month_key(day)}', 'all']
+
+
+def key_matches_range(range_name: str, key: str) -> bool:
+    """Whether key names a heatmap of range_name (2025-W07 for week, 2025-02 for month)."""
+    pattern = HEATMAP_KEY_PATTERNS.get(range_name)
+    return pattern is not None and pattern.fullmatch(key) is not None
+
+
+def bucket_id(range_name: str, key: Optional[str] = None, moment: datetime = None) -> str:
+    """Heatmap document id for a range, defaulting to the one containing moment (or now)."""
+    if range_name == 'all':
+        return 'all'
+    if not key:
+        day = (moment or datetime.now()).date()
+        key = week_key(day) if range_name == 'week' else month_key(day)
+    return f'{range_name}_{key}'
+
+
+def search_fields(moment: datetime, category: str) -> dict:
+    cell = cell_key(moment)
+    return {'total': {cell: 1}, 'byCategory': {category: {cell: 1}}}
+
+
+async def increment_heatmap(db, bucket: str, fields: dict):
+    await db.collection(HEATMAP_COLLECTION).document(bucket).set(increment_fields(fields), merge=True)
+
+
+def to_matrix(cells: Dict[str, int]) -> List[List[int]]:
+    """Expand {'<weekday>_<hour>': n} into 7 rows (Monday first) of 24 hourly counts."""
+    matrix = [[0] * 24 for _ in range(7)]
+    for cell, value in (cells or {}).items():
+        weekday, hour = cell.split('_')
+        matrix[int(weekday)][int(hour)] = value
+    return matrix
+
+
+async def read_heatmap(db, bucket: str, category: Optional[str] = None) -> dict:
+    """One heatmap as 7x24 matrices: overall, or for a single category when given."""
+    doc = await db.collection(HEATMAP_COLLECTION).document(bucket).get()
+    data = doc.to_dict() if doc.exists else {}
+    if category:
+        cells = data.get('byCategory', {}).get(category, {})
+        return {'bucket': bucket, 'category': category, 'matrix': to_matrix(cells)}
+    return {
+        'bucket': bucket,
+        'matrix': to_matrix(data.get('total')),
+        'byCategory': {name: to_matrix(cells) for name, cells in data.get('byCategory', {}).items()}
+    }
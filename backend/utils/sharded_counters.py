@@ -0,0 +1,60 @@
+"""Sharded daily analytics counters
+
+A single Firestore document sustains roughly one write per second, so the
+per-day counters are spread over N shard documents
+(analyticsDailyShards/{date}_{shard}). Writers pick a shard at random and
+readers sum every shard of the days they need.
+"""
+import os
+import random
+from typing import Dict
+from firebase_admin import firestore
+
+SHARD_COLLECTION = 'analyticsDailyShards'
+ANALYTICS_COUNTER_SHARDS = max(1, int(os.getenv('ANALYTICS_COUNTER_SHARDS', 10)))
+
+
+def increment_fields(fields: dict) -> dict:
+    """Turn {'a': 1, 'b': {'c': 2}} into the same shape of firestore.Increment transforms."""
+    return {
+        key: increment_fields(value) if isinstance(value, dict) else firestore.Increment(value)
+        for key, value in fields.items()
+    }
+
+
+def sum_into(total: dict, values: dict):
+    """Add the numbers in values into total, recursing into nested maps."""
+    for key, value in values.items():
+        if isinstance(value, dict):
+            sum_into(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            total[key] = total.get(key, 0) + value
+
+
+def shard_ref(db, day: str, shard: int):
+    return db.collection(SHARD_COLLECTION).document(f'{day}_{shard}')
+
+
+async def increment_daily(db, day: str, fields: dict, shards: int = None):
+    """Add fields (nested dict of numbers) to a random shard of day's counters."""
+    shard = random.randrange(shards or ANALYTICS_COUNTER_SHARDS)
+    await shard_ref(db, day, shard).set({
+        'date': day,
+        'shard': shard,
+        **increment_fields(fields)
+    }, merge=True)
+
+
+async def read_daily_shards(db, start_day: str, end_day: str) -> Dict[str, dict]:
+    """Summed shard counters per day for start_day..end_day inclusive (YYYY-MM-DD)."""
+    query = (db.collection(SHARD_COLLECTION)
+             .where('date', '>=', start_day)
+             .where('date', '<=', end_day))
+    totals = {}
+    async for doc in query.stream():
+        data = doc.to_dict() or {}
+        day = data.pop('date', None)
+        data.pop('shard', None)
+        if day:
+            sum_into(totals.setdefault(day, {}), data)
+    return totals
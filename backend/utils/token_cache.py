@@ -0,0 +1,105 @@
+"""Cache of verified Firebase ID tokens
+
+auth.verify_id_token checks the token's RSA signature on every call. A
+verified token's claims cannot change before it expires, so they are cached
+under the token's SHA-256 hash until its `exp`. Revocation (a disabled user
+or revoked refresh tokens) is only visible through a round trip to Firebase
+Auth. With AUTH_CHECK_REVOKED enabled each cached token is re-checked at most
+every AUTH_REVOCATION_CHECK_INTERVAL seconds.
+
+Google's signing certificates are cached by firebase_admin's HTTP session
+according to their Cache-Control headers. The background prefetcher
+re-requests them through that same session, so a refresh never lands on a
+user request.
+"""
+import asyncio
+import hashlib
+import os
+import time
+import firebase_admin
+from firebase_admin import auth
+from utils.cache import LRUCache
+
+# Where firebase_admin fetches the ID token signing certificates from
+ID_TOKEN_CERT_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+
+def _token_key(id_token: str) -> str:
+    return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+
+class VerifiedTokenCache:
+    def __init__(self):
+        self.check_revoked = os.getenv('AUTH_CHECK_REVOKED', 'false').strip().lower() in ('1', 'true', 'yes')
+        self.revocation_interval = float(os.getenv('AUTH_REVOCATION_CHECK_INTERVAL', 300))
+        self.cert_refresh_interval = float(os.getenv('AUTH_CERT_REFRESH_INTERVAL', 1800))
+        self._cache = LRUCache(max_entries=int(os.getenv('AUTH_TOKEN_CACHE_MAX_ENTRIES', 10000)))
+        self._task = None
+        self._metrics = {'hits': 0, 'misses': 0, 'revocationChecks': 0, 'certPrefetches': 0, 'certPrefetchErrors': 0}
+
+    async def verify(self, id_token: str) -> dict:
+        """Decoded claims of id_token, verifying it only when not already cached.
+
+        Raises the same auth errors as auth.verify_id_token.
+        """
+        key = _token_key(id_token)
+        entry = self._cache.get(key)
+        now = time.time()
+
+        if entry is not None and not (self.check_revoked and now - entry['checkedAt'] >= self.revocation_interval):
+            self._metrics['hits'] += 1
+            return entry['claims']
+
+        if entry is None:
+            self._metrics['misses'] += 1
+        else:
+            self._metrics['revocationChecks'] += 1
+        try:
+            # Off the event loop: a certificate fetch or revocation check is a blocking HTTP call
+            claims = await asyncio.to_thread(auth.verify_id_token, id_token, check_revoked=self.check_revoked)
+        except Exception:
+            self._cache.delete(key)
+            raise
+
+        ttl = claims.get('exp', 0) - now
+        if ttl > 0:
+            self._cache.set(key, {'claims': claims, 'checkedAt': now}, ttl_seconds=ttl)
+        return claims
+
+    def invalidate(self, id_token: str):
+        self._cache.delete(_token_key(id_token))
+
+    def _prefetch_certs(self):
+        # The verifier's own request object, so the certificates land in the cache it reads from
+        verifier = auth._get_client(firebase_admin.get_app())._token_verifier
+        verifier.request(ID_TOKEN_CERT_URL)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self._prefetch_certs)
+                self._metrics['certPrefetches'] += 1
+            except Exception as e:
+                self._metrics['certPrefetchErrors'] += 1
+                print(f"[AUTH] Signing certificate prefetch failed: {str(e)}")
+            await asyncio.sleep(self.cert_refresh_interval)
+
+    def start(self):
+        """Start prefetching signing certificates on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_metrics(self) -> dict:
+        return {**self._metrics, 'cached': len(self._cache)}
+
+
+token_cache = VerifiedTokenCache()
@@ -14,6 +14,21 @@ import {
 import { auth, db } from '../firebase/config';
 import type { Business, BusinessLocation } from '../types/firebase';
 
+// Same normalization as the backend's utils/business_keys.normalize_key_part
+const normalizeKeyPart = (value: unknown): string =>
+  String(value || '').replace(/\s+/g, ' ').trim().toLowerCase();
+
+// Deterministic savedBusinesses id, identical to the backend's saved_business_id:
+// the first 32 hex chars of sha256(userId, name, address joined by \x1f)
+export const savedBusinessId = async (userId: string, name: string, address: string): Promise<string> => {
+  const raw = [String(userId), normalizeKeyPart(name), normalizeKeyPart(address)].join('\x1f');
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(raw));
+  return Array.from(new Uint8Array(digest))
+    .map(byte => byte.toString(16).padStart(2, '0'))
+    .join('')
+    .slice(0, 32);
+};
+
 export const BusinessService = {
   saveBusiness: async (userId: string, business: Business): Promise<string> => {
     if (!userId) {
@@ -29,39 +44,22 @@ export const BusinessService = {
       await currentUser.getIdToken(true);
       console.log('[BUSINESS] Authentication verified for user:', userId);
       
-      // Check for duplicates before saving
-      const existingBusinessesQuery = firestoreQuery(
-        collection(db, 'savedBusinesses'),
-        where('userId', '==', userId),
-        where('businessInfo.name', '==', business.name || 'Unnamed Business')
-      );
-      
-      const existingSnapshot = await getDocs(existingBusinessesQuery);
-      
-      // Check if business already exists for this user
-      const isDuplicate = existingSnapshot.docs.some(doc => {
-        const data = doc.data();
-        const existingBusiness = data.businessInfo;
-        
-        // Match by name and location (or other unique identifiers)
-        const nameMatch = existingBusiness.name === (business.name || 'Unnamed Business');
-        const locationMatch = JSON.stringify(existingBusiness.location || {}) === 
-                             JSON.stringify(business.location || {});
-        
-        return nameMatch && locationMatch;
-      });
-      
-      if (isDuplicate) {
+      const name = business.name || 'Unnamed Business';
+      const address = business.address || business.location?.address || '';
+
+      // Same id the backend derives, so a business is saved once no matter which side writes it
+      const saveDocRef = doc(db, 'savedBusinesses', await savedBusinessId(userId, name, address));
+      const existingSnapshot = await getDoc(saveDocRef);
+
+      if (existingSnapshot.exists()) {
         console.log('[BUSINESS] Business already saved for this user');
         throw new Error('This business is already in your saved list');
       }
       
-      // Generate unique document ID
-      const saveDocRef = doc(collection(db, 'savedBusinesses'));
-      
       // Clean business data to avoid property conflicts - FIXED: Preserve phone
       const cleanBusinessInfo = {
-        name: business.name || 'Unnamed Business',
+        name,
+        address,
         description: business.description || '',
         category: business.category || 'uncategorized',
         services: business.services || [],